@@ -0,0 +1,86 @@
+"""
+Benchmark: memory per comment, dict rows vs CommentRecord.
+
+Usage:
+    python benchmarks/bench_comment_memory.py [--comments N]
+
+Parses N synthetic comments page by page (as scrape_with_instagrapi does),
+keeps the rows and reports the retained memory scaled to one million
+comments, plus parse time and the time to read every column back (the
+formatting cost CommentRecord moves to export time).
+"""
+import os
+import sys
+import gc
+import time
+import argparse
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from helpers.comment_record import CommentRecord, COMMENT_COLUMNS
+from fixtures import iter_comment_pages
+
+
+def legacy_row(raw, number):
+    """Previous comment_row_from_raw: a dict with the formatted columns"""
+    username = (raw.get("user") or {}).get("username", "")
+    created_at = raw.get("created_at_utc") or raw.get("created_at")
+    is_reply = bool(raw.get("parent_comment_id") or raw.get("replied_to_comment_id"))
+    return {
+        'Comment Number': number,
+        'User @': f'@{username}',
+        'User URL': f'https://instagram.com/{username}',
+        'Comment': raw.get("text", ""),
+        'Comment Likes': raw.get("comment_like_count", 0),
+        'Comment Time': datetime.fromtimestamp(created_at, timezone.utc).strftime('%Y-%m-%d %H:%M:%S') if created_at else '',
+        'Is 2nd Level Comment': is_reply
+    }
+
+
+def build(make_row, total):
+    rows = []
+    replies = 0
+    for page, _ in iter_comment_pages(total):
+        for raw in page:
+            row = make_row(raw, len(rows) + 1)
+            replies += bool(row['Is 2nd Level Comment'])
+            rows.append(row)
+    return rows, replies
+
+
+def bench(label, make_row, total):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows, replies = build(make_row, total)
+    parse_seconds = time.perf_counter() - started
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for row in rows:
+        for column in COMMENT_COLUMNS:
+            row.get(column, "")
+    read_seconds = time.perf_counter() - started
+
+    per_million = retained / total * 1_000_000 / (1024 * 1024)
+    print(f"{label:<14}: {retained / total:7.0f} B/comment, {per_million:8.0f} MB per million, "
+          f"parse {total / parse_seconds:9,.0f}/s, export read {total / read_seconds:9,.0f}/s "
+          f"({replies} replies)")
+    return retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--comments", type=int, default=200000)
+    args = parser.parse_args()
+
+    legacy = bench("dict rows", legacy_row, args.comments)
+    compact = bench("CommentRecord", CommentRecord.from_raw, args.comments)
+    print(f"memory ratio            : {legacy / compact:6.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
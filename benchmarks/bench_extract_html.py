@@ -0,0 +1,80 @@
+"""
+Micro-benchmark: extract_media_data_from_html vs the previous regex version.
+
+Usage:
+    python benchmarks/bench_extract_html.py [fixtures_dir] [--repeat N]
+
+Uses every *.html file in fixtures_dir (saved Scrapfly pages), else the
+recorded pages in benchmarks/fixtures/html/, else a synthetic rendered post
+page of realistic size.
+"""
+import os
+import re
+import sys
+import json
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from scraper_instagram import extract_media_data_from_html, find_in_dict
+from fixtures import synthetic_page, load_recorded
+
+
+def legacy_extract(html):
+    """Previous implementation: regex over every script + full tree walk"""
+    scripts = re.findall(r'<script[^>]*>(.*?)</script>', html, re.DOTALL)
+    for script in scripts:
+        if 'xdt_api__v1__media__shortcode__web_info' in script and len(script) > 10000:
+            try:
+                data = json.loads(script)
+                media_info = find_in_dict(data, 'xdt_api__v1__media__shortcode__web_info')
+                if media_info and 'items' in media_info and media_info['items']:
+                    return media_info['items'][0]
+            except json.JSONDecodeError:
+                continue
+    return None
+
+
+def bench(fn, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            fn(html)
+    return (time.perf_counter() - start) / (repeat * len(pages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("fixtures_dir", nargs="?")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.fixtures_dir:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.fixtures_dir, "*.html"))):
+            with open(path, encoding="utf-8") as f:
+                pages.append(f.read())
+    else:
+        pages = load_recorded("html") or [synthetic_page()]
+
+    if not pages:
+        print("No fixtures found")
+        return
+
+    for html in pages:
+        if legacy_extract(html) != extract_media_data_from_html(html):
+            print("WARNING: new extractor disagrees with the legacy one on a fixture")
+
+    size_kb = sum(len(p) for p in pages) / len(pages) / 1024
+    legacy = bench(legacy_extract, pages, args.repeat)
+    fast = bench(extract_media_data_from_html, pages, args.repeat)
+    print(f"{len(pages)} page(s), avg {size_kb:,.0f} KB")
+    print(f"legacy  : {legacy * 1000:8.3f} ms/page")
+    print(f"current : {fast * 1000:8.3f} ms/page")
+    print(f"speedup : {legacy / fast:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
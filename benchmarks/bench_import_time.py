@@ -0,0 +1,95 @@
+"""
+Benchmark: startup cost of importing the scraper.
+
+Usage:
+    python benchmarks/bench_import_time.py [--repeat 5] [--budget-ms 150] [--top 10]
+
+Imports scraper_instagram in fresh interpreters (python -X importtime) and
+reports the median import time and the slowest modules. Exits with status 1
+when the median goes over the budget or when one of the heavy dependencies
+(instagrapi, scrapfly, openpyxl, pyarrow, requests...) is imported eagerly,
+since those must only load on first use.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Must not be in sys.modules right after "import scraper_instagram"
+LAZY_MODULES = ["instagrapi", "pydantic", "scrapfly", "openpyxl", "pyarrow", "zstandard", "requests"]
+
+CHILD = (
+    "import sys, json, time; t = time.perf_counter(); import scraper_instagram; "
+    "elapsed = time.perf_counter() - t; "
+    "print(json.dumps({'seconds': elapsed, 'loaded': [m for m in %r if m in sys.modules]}))"
+) % (LAZY_MODULES,)
+
+
+def run_once():
+    """Import in a fresh interpreter: (seconds, eagerly loaded heavy modules, -X importtime lines)"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        cwd=SRC, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result["seconds"], result["loaded"], proc.stderr.splitlines()
+
+
+def slowest_modules(lines, top):
+    """(cumulative us, module) of the top-level imports, slowest first"""
+    # Interpreter startup (site and whatever .pth files pull in) comes first
+    for idx, line in enumerate(lines):
+        if line.rstrip().endswith("| site"):
+            lines = lines[idx + 1:]
+            break
+
+    modules = []
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            cumulative = int(cumulative.strip())
+        except ValueError:
+            continue
+        # Keep only the imports done directly by scraper_instagram and helpers
+        depth = len(name) - len(name.lstrip())
+        if depth <= 3:
+            modules.append((cumulative, name.strip()))
+    return sorted(modules, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=150)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.repeat)]
+    median_ms = statistics.median(seconds for seconds, _, _ in runs) * 1000
+    eager = sorted({name for _, loaded, _ in runs for name in loaded})
+
+    print(f"import scraper_instagram: {median_ms:.1f} ms median over {args.repeat} runs "
+          f"(budget {args.budget_ms:.0f} ms)")
+    print("slowest imports (cumulative):")
+    for cumulative, name in slowest_modules(runs[-1][2], args.top):
+        print(f"   {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if eager:
+        print(f"EAGER IMPORTS: {', '.join(eager)} (must be imported on first use)")
+        failed = True
+    if median_ms > args.budget_ms:
+        print("OVER BUDGET")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
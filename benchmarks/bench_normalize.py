@@ -0,0 +1,79 @@
+"""
+Benchmark: media payload normalization (legacy walk vs current walk vs schema).
+
+Usage:
+    python benchmarks/bench_normalize.py [--items N] [--repeat N]
+
+Builds large synthetic carousel and clips payloads shaped like
+media/{id}/info/ items, with None in the list fields Instagram tends to null.
+"""
+import os
+import sys
+import copy
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from scraper_instagram import (
+    normalize_lists,
+    normalize_with_schema,
+    LIST_FIELDS_THAT_MUST_BE_LISTS,
+)
+from fixtures import carousel_payload, clips_payload
+
+
+def legacy_normalize_lists(obj, list_fields):
+    """Previous implementation: recursive, copies items() at every level"""
+    if isinstance(obj, dict):
+        for k, v in list(obj.items()):
+            if v is None and k in list_fields:
+                obj[k] = []
+            if isinstance(obj[k], (dict, list)):
+                legacy_normalize_lists(obj[k], list_fields)
+    elif isinstance(obj, list):
+        for item in obj:
+            if isinstance(item, (dict, list)):
+                legacy_normalize_lists(item, list_fields)
+    return obj
+
+
+def bench(label, fn, payloads, repeat):
+    # Each call gets a fresh copy (the normalizers mutate in place); only the
+    # call itself is timed
+    elapsed = 0.0
+    for _ in range(repeat):
+        for payload in copy.deepcopy(payloads):
+            start = time.perf_counter()
+            fn(payload)
+            elapsed += time.perf_counter() - start
+    per_call = elapsed / (repeat * len(payloads))
+    print(f"{label:<28}: {per_call * 1e6:10.1f} us/payload")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=20, help="carousel children")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    payloads = [carousel_payload(items=args.items), clips_payload()]
+
+    # The schema must fix exactly what the full walk fixes on these shapes
+    expected = [legacy_normalize_lists(copy.deepcopy(p), LIST_FIELDS_THAT_MUST_BE_LISTS) for p in payloads]
+    actual = [normalize_with_schema(copy.deepcopy(p)) for p in payloads]
+    if expected != actual:
+        print("WARNING: schema normalization differs from the full walk on these payloads")
+
+    legacy = bench("legacy normalize_lists", lambda p: legacy_normalize_lists(p, LIST_FIELDS_THAT_MUST_BE_LISTS),
+                   payloads, args.repeat)
+    walk = bench("normalize_lists (stack)", lambda p: normalize_lists(p, LIST_FIELDS_THAT_MUST_BE_LISTS),
+                 payloads, args.repeat)
+    schema = bench("normalize_with_schema", normalize_with_schema, payloads, args.repeat)
+    print(f"speedup stack vs legacy    : {legacy / walk:6.1f}x")
+    print(f"speedup schema vs legacy   : {legacy / schema:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""
+Local stand-in for the Instagram private API and the Scrapfly API.
+
+Usage:
+    python benchmarks/fake_service.py [--port 8765] [--comments 500] [--page-size 50]
+                                      [--latency-ms 150] [--jitter-ms 100] [--max-rps 0]
+                                      [--throttle-rate 0.0] [--unauthorized-rate 0.0]
+                                      [--login-required-rate 0.0] [--challenge-rate 0.0]
+                                      [--empty-page-rate 0.0] [--duplicate-rate 0.0]
+                                      [--cursor min_id|max_id] [--scrapfly-min-tier plain]
+
+Serves media/{id}/info/, paginated media/{id}/comments/,
+media/{id}/comments/{comment}/child_comments/, users/{id}/info/, login and
+timeline endpoints under /api/v1/, and Scrapfly's /scrape returning rendered post
+HTML, all built from the benchmark fixtures (recorded ones when available).
+Latency, 429/401/login_required/challenge responses and pagination quirks
+(empty pages, comments repeated across page boundaries) are injected at the
+configured rates. Point the scraper at it with:
+
+    FAKE_SERVICE_URL=http://127.0.0.1:8765 python src/scraper_instagram.py
+
+GET /__stats returns request counts per endpoint and status.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import fixtures
+
+SHORTCODE_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+SCRAPFLY_TIERS = ["plain", "asp", "render"]
+SCRAPFLY_TIER_COST = {"plain": 1, "asp": 5, "render": 25}
+
+THROTTLED_BODY = {"message": "Please wait a few minutes before you try again.", "status": "fail"}
+LOGIN_REQUIRED_BODY = {"message": "login_required", "status": "fail", "logout_reason": 2}
+UNAUTHORIZED_BODY = {"message": "unauthorized", "status": "fail"}
+CHALLENGE_BODY = {"message": "challenge_required", "status": "fail",
+                  "challenge": {"url": "https://i.instagram.com/challenge/", "api_path": "/challenge/"}}
+
+
+def code_from_pk(pk):
+    """Inverse of instagrapi's media_pk_from_code"""
+    pk = int(pk)
+    code = ""
+    while pk:
+        pk, rest = divmod(pk, 64)
+        code = SHORTCODE_ALPHABET[rest] + code
+    return code or "A"
+
+
+def shortcode_from_url(url):
+    match = re.search(r"/(?:p|reel|reels)/([^/?#&]+)", url or "")
+    return match.group(1) if match else "DQVNHKXEaWs"
+
+
+class FakeState:
+    """Configuracion y contadores compartidos por todos los hilos del servidor"""
+
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.recent = deque()
+        self.recorded_media = fixtures.load_recorded("media_info")
+        self.recorded_html = fixtures.load_recorded("html")
+
+    def count(self, endpoint, status):
+        with self.lock:
+            key = f"{endpoint} {status}"
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def over_rate_limit(self):
+        """Ventana deslizante de un segundo para --max-rps"""
+        if not self.args.max_rps:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            while self.recent and now - self.recent[0] > 1.0:
+                self.recent.popleft()
+            if len(self.recent) >= self.args.max_rps:
+                return True
+            self.recent.append(now)
+            return False
+
+    def media_item(self, media_pk):
+        if self.recorded_media:
+            item = dict(self.recorded_media[int(media_pk) % len(self.recorded_media)])
+        else:
+            item = fixtures.clips_payload()
+            item.pop("comments", None)
+        item.update({
+            "pk": str(media_pk),
+            "id": f"{media_pk}_1",
+            "code": code_from_pk(media_pk),
+            "taken_at": 1761600000,
+            "like_count": 1234,
+            "comment_count": self.args.comments,
+        })
+        item.setdefault("caption", {"text": "caption"})
+        return item
+
+    def post_html(self, shortcode):
+        if self.recorded_html:
+            return self.recorded_html[sum(map(ord, shortcode)) % len(self.recorded_html)]
+        html = fixtures.synthetic_page()
+        return html.replace("DQVNHKXEaWs", shortcode).replace(
+            '"comment_count": 171', f'"comment_count": {self.args.comments}'
+        )
+
+    def comments_page(self, media_pk, params):
+        """Una pagina de comentarios con cursor opaco, como la API real"""
+        args = self.args
+        cursor = params.get("min_id") or params.get("max_id")
+        try:
+            offset = json.loads(cursor)["offset"] if cursor else 0
+        except (ValueError, KeyError, TypeError):
+            offset = 0
+
+        end = min(offset + args.page_size, args.comments)
+        seed = int(media_pk) % 1000000 * 1000
+        numbers = range(offset + 1, end + 1)
+        if params.get("sort_order") == "newest":
+            # Newest first: offsets count back from the latest comment
+            numbers = range(args.comments - offset, args.comments - end, -1)
+        page = [fixtures.raw_comment(seed + n) for n in numbers]
+        has_more = end < args.comments
+
+        # Pagination quirks of the real endpoint
+        if has_more and random.random() < args.empty_page_rate:
+            page = []
+        elif offset and page and random.random() < args.duplicate_rate:
+            page.insert(0, fixtures.raw_comment(seed + numbers.start - numbers.step))
+
+        body = {"comments": page, "comment_count": args.comments, "status": "ok"}
+        if has_more:
+            next_cursor = json.dumps({"offset": end, "server_cursor": f"QVFE{end:08x}"})
+            if args.cursor == "min_id":
+                body.update(has_more_headload_comments=True, next_min_id=next_cursor)
+            else:
+                body.update(has_more_comments=True, next_max_id=next_cursor)
+        return body
+
+    def child_comments_page(self, comment_pk, params):
+        """Respuestas de un comentario: tantas como su child_comment_count, paginadas"""
+        total = int(comment_pk) % 3
+        cursor = params.get("max_id")
+        offset = int(cursor) if cursor and cursor.isdigit() else 0
+        end = min(offset + self.args.reply_page_size, total)
+        children = [
+            fixtures.raw_comment(int(comment_pk) * 10 + n, parent_pk=comment_pk)
+            for n in range(offset + 1, end + 1)
+        ]
+        body = {"child_comments": children, "child_comment_count": total, "status": "ok"}
+        if end < total:
+            body.update(has_more_tail_child_comments=True, next_max_child_cursor=str(end))
+        return body
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    server_version = "FakeInstagram/1.0"
+    state = None
+
+    def log_message(self, format, *args):
+        if self.state.args.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, body, endpoint):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.state.count(endpoint, status)
+
+    def injected_error(self, endpoint, allow_login_errors=True):
+        """Respuesta de error inyectada, o None si esta request pasa"""
+        args = self.state.args
+        if self.state.over_rate_limit() or random.random() < args.throttle_rate:
+            return 429, THROTTLED_BODY
+        if allow_login_errors:
+            if random.random() < args.challenge_rate:
+                return 400, CHALLENGE_BODY
+            if random.random() < args.login_required_rate:
+                return 403, LOGIN_REQUIRED_BODY
+            if random.random() < args.unauthorized_rate:
+                return 401, UNAUTHORIZED_BODY
+        return None
+
+    def simulate_latency(self):
+        args = self.state.args
+        delay = args.latency_ms + random.uniform(-args.jitter_ms, args.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        path = urlparse(self.path).path
+        if path.rstrip("/") == "/api/v1/accounts/login":
+            self.simulate_latency()
+            error = self.injected_error("login", allow_login_errors=False)
+            if error:
+                return self.send_json(*error, "login")
+            return self.send_json(200, {
+                "logged_in_user": {"pk": "1", "username": "fake_user"}, "status": "ok",
+            }, "login")
+        self.send_json(404, {"message": "not found", "status": "fail"}, "unknown")
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        path = parsed.path
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+
+        if path == "/__stats":
+            with self.state.lock:
+                stats = dict(self.state.stats)
+            return self.send_json(200, stats, "stats")
+
+        if path == "/scrape":
+            return self.handle_scrape(params)
+
+        match = re.fullmatch(r"/api/v1/media/(\d+)/comments/(\d+)/child_comments/?", path)
+        if match:
+            self.simulate_latency()
+            error = self.injected_error("child_comments")
+            if error:
+                return self.send_json(*error, "child_comments")
+            return self.send_json(200, self.state.child_comments_page(match.group(2), params), "child_comments")
+
+        match = re.fullmatch(r"/api/v1/users/(\d+)/info/?", path)
+        if match:
+            self.simulate_latency()
+            error = self.injected_error("user_info")
+            if error:
+                return self.send_json(*error, "user_info")
+            return self.send_json(200, {"user": fixtures.user_info(match.group(1)), "status": "ok"}, "user_info")
+
+        match = re.fullmatch(r"/api/v1/media/(\d+)/(info|comments)/?", path)
+        if match:
+            media_pk, kind = match.groups()
+            endpoint = f"media_{kind}"
+            self.simulate_latency()
+            error = self.injected_error(endpoint)
+            if error:
+                return self.send_json(*error, endpoint)
+            if kind == "info":
+                body = {"items": [self.state.media_item(media_pk)], "num_results": 1, "status": "ok"}
+            else:
+                body = self.state.comments_page(media_pk, params)
+            return self.send_json(200, body, endpoint)
+
+        if path.rstrip("/") == "/api/v1/feed/timeline":
+            self.simulate_latency()
+            error = self.injected_error("timeline")
+            if error:
+                return self.send_json(*error, "timeline")
+            return self.send_json(200, {"feed_items": [], "status": "ok"}, "timeline")
+
+        self.send_json(404, {"message": "not found", "status": "fail"}, "unknown")
+
+    def handle_scrape(self, params):
+        """Scrapfly /scrape: tiers below --scrapfly-min-tier get a login wall without media data"""
+        args = self.state.args
+        if params.get("render_js") == "true":
+            tier = "render"
+        elif params.get("asp") == "true":
+            tier = "asp"
+        else:
+            tier = "plain"
+        endpoint = f"scrape_{tier}"
+
+        self.simulate_latency()
+        if tier == "render":
+            time.sleep(args.render_extra_ms / 1000)
+        error = self.injected_error(endpoint, allow_login_errors=False)
+        if error:
+            return self.send_json(*error, endpoint)
+
+        if SCRAPFLY_TIERS.index(tier) >= SCRAPFLY_TIERS.index(args.scrapfly_min_tier):
+            content = self.state.post_html(shortcode_from_url(params.get("url")))
+        else:
+            content = "<html><head><title>Login • Instagram</title></head><body></body></html>"
+
+        return self.send_json(200, {
+            "result": {"content": content, "status_code": 200, "success": True, "url": params.get("url")},
+            "context": {"cost": {"total": SCRAPFLY_TIER_COST[tier]}},
+        }, endpoint)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--comments", type=int, default=500, help="comments per post")
+    parser.add_argument("--page-size", type=int, default=50, help="comments per API page")
+    parser.add_argument("--reply-page-size", type=int, default=1, help="replies per child_comments page")
+    parser.add_argument("--latency-ms", type=float, default=150, help="mean response latency")
+    parser.add_argument("--jitter-ms", type=float, default=100, help="uniform jitter around the mean")
+    parser.add_argument("--render-extra-ms", type=float, default=2000,
+                        help="extra latency of the Scrapfly JS rendering tier")
+    parser.add_argument("--max-rps", type=int, default=0,
+                        help="answer 429 beyond this many requests per second (0 = no limit)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="probability of a 429")
+    parser.add_argument("--unauthorized-rate", type=float, default=0.0, help="probability of a 401")
+    parser.add_argument("--login-required-rate", type=float, default=0.0,
+                        help="probability of a login_required response")
+    parser.add_argument("--challenge-rate", type=float, default=0.0,
+                        help="probability of a challenge_required response")
+    parser.add_argument("--empty-page-rate", type=float, default=0.0,
+                        help="probability of an empty comments page that still has more")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0,
+                        help="probability of repeating the previous page's last comment")
+    parser.add_argument("--cursor", choices=["min_id", "max_id"], default="min_id",
+                        help="cursor style of the comments endpoint")
+    parser.add_argument("--scrapfly-min-tier", choices=SCRAPFLY_TIERS, default="plain",
+                        help="cheapest Scrapfly tier that gets the real page")
+    parser.add_argument("--seed", type=int, help="random seed for reproducible runs")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    return parser.parse_args(argv)
+
+
+def make_server(args):
+    handler = type("Handler", (FakeHandler,), {"state": FakeState(args)})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    args = parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    server = make_server(args)
+    host, port = server.server_address[:2]
+    print(f"Fake Instagram/Scrapfly service on http://{host}:{port}")
+    print(f"   FAKE_SERVICE_URL=http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stats = server.RequestHandlerClass.state.stats
+        print("\nRequests served:")
+        for key, value in sorted(stats.items()):
+            print(f"   {key:<24} {value:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Fixtures for the offline benchmarks.
+
+Synthetic generators shaped like the real responses (rendered post HTML,
+media/{id}/info/ items, comments endpoint pages), plus recorded fixtures
+under benchmarks/fixtures/ which can be imported from the local response
+cache (scrape/cache) after a normal run.
+"""
+import os
+import json
+import glob
+import shutil
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def synthetic_page(n_scripts=150, n_candidates=200):
+    """Rendered post page: lots of unrelated scripts plus the relay payload"""
+    filler = json.dumps({"require": [["Bootloader", "handle", None, [{"x": "y" * 64}] * 60]]})
+    media = {
+        "pk": "3456789012345678901",
+        "code": "DQVNHKXEaWs",
+        "taken_at": 1761600000,
+        "like_count": 1234,
+        "comment_count": 171,
+        "user": {"username": "someone", "pk": "123"},
+        "caption": {"text": "caption " * 50},
+        "image_versions2": {"candidates": [
+            {"url": f"https://scontent.cdninstagram.com/v/{i}.jpg", "width": 1080, "height": 1920}
+            for i in range(n_candidates)
+        ]},
+        "video_versions": [{"url": f"https://scontent.cdninstagram.com/v/{i}.mp4", "type": 101} for i in range(8)],
+    }
+    payload = {"require": [["ScheduledServerJS", "handle", None, [{"__bbox": {"require": [
+        ["RelayPrefetchedStreamCache", "next", [], ["adp_PolarisPostRootQuery", {"__bbox": {
+            "complete": True,
+            "result": {"data": {"xdt_api__v1__media__shortcode__web_info": {"items": [media]}}},
+        }}]],
+    ]}}]]]}
+
+    parts = ["<html><head>"]
+    for i in range(n_scripts):
+        parts.append(f'<script type="application/json" data-sjs>{filler}</script>')
+        if i == n_scripts // 2:
+            parts.append(f'<script type="application/json" data-sjs>{json.dumps(payload)}</script>')
+    parts.append("</head><body>" + "<div class='x'></div>" * 2000 + "</body></html>")
+    return "".join(parts)
+
+
+def _image_versions(n):
+    return {"candidates": [
+        {"url": f"https://scontent.cdninstagram.com/v/{i}.jpg", "width": 1080, "height": 1350,
+         "scans_profile": "e15", "estimated_scans_sizes": [1, 2, 3, 4, 5]}
+        for i in range(n)
+    ]}
+
+
+def carousel_payload(items=20, candidates=30):
+    return {
+        "pk": "3456789012345678901",
+        "media_type": 8,
+        "user": {"pk": "1", "username": "someone", "friendship_status": {"following": False}},
+        "caption": {"text": "caption " * 100},
+        "usertags": None,
+        "sponsor_tags": None,
+        "video_versions": None,
+        "carousel_media": [
+            {
+                "pk": str(i),
+                "media_type": 1 if i % 2 else 2,
+                "image_versions2": _image_versions(candidates),
+                "video_versions": None if i % 2 else [{"url": f"https://x/{i}.mp4", "type": 101}] * 6,
+                "usertags": {"in": None},
+                "sharing_friction_info": {"should_have_sharing_friction": False},
+            }
+            for i in range(items)
+        ],
+        "image_versions2": _image_versions(candidates),
+        "comments": [{"pk": str(i), "text": "x" * 40, "user": {"username": f"u{i}"}} for i in range(items * 10)],
+    }
+
+
+def clips_payload(candidates=30, filters=40):
+    return {
+        "pk": "3456789012345678902",
+        "media_type": 2,
+        "product_type": "clips",
+        "user": {"pk": "1", "username": "someone"},
+        "image_versions2": _image_versions(candidates),
+        "video_versions": [{"url": f"https://x/{i}.mp4", "type": 101} for i in range(10)],
+        "clips_attribution_info": None,
+        "clips_metadata": {
+            "clips_items": None,
+            "original_sound_info": {"audio_filter_infos": None, "consumption_info": {"x": 1}},
+            "music_info": None,
+            "additional_audio_info": {"additional_audio_assets": None},
+            "audio_ranking_info": {"best_audio_cluster_id": "1"},
+            "mashup_info": {"formatted_mashups_count": None},
+            "branded_content_tag_info": {"can_add_tag": False},
+            "filters": [{"id": i, "params": {"a": [1, 2, 3]}} for i in range(filters)],
+        },
+        "comments": [{"pk": str(i), "text": "x" * 40, "user": {"username": f"u{i}"}} for i in range(300)],
+    }
+
+
+def raw_comment(pk, parent_pk=None):
+    """One comment as returned by media/{id}/comments/"""
+    comment = {
+        "pk": str(pk),
+        "text": f"comment number {pk} " + "lorem ipsum " * (pk % 7),
+        "created_at_utc": 1761600000 + pk,
+        "comment_like_count": pk % 50,
+        "child_comment_count": 0 if parent_pk else pk % 3,
+        "user": {"pk": str(100000 + pk % 5000), "username": f"user_{pk % 5000}", "is_verified": False},
+    }
+    if parent_pk:
+        comment["parent_comment_id"] = str(parent_pk)
+    return comment
+
+
+def user_info(pk):
+    """A user as returned by users/{pk}/info/ (the commenters of raw_comment)"""
+    pk = int(pk)
+    return {
+        "pk": str(pk),
+        "username": f"user_{(pk - 100000) % 5000}",
+        "full_name": f"User {pk}",
+        "is_private": pk % 4 == 0,
+        "is_verified": pk % 97 == 0,
+        "follower_count": (pk * 37) % 250000,
+        "following_count": (pk * 11) % 3000,
+        "media_count": pk % 400,
+        "account_type": pk % 3 + 1,
+        "is_business": pk % 3 == 1,
+    }
+
+
+def iter_comment_pages(total, page_size=50, reply_every=10):
+    """
+    Lazily yield (raw_comments, next_cursor) pages for `total` comments, the
+    same shape iter_comment_pages in the scraper produces. Every reply_every-th
+    comment is a reply. Generated on the fly so 1M comments fit in memory.
+    """
+    for start in range(1, total + 1, page_size):
+        end = min(start + page_size, total + 1)
+        page = [
+            raw_comment(pk, parent_pk=pk - 1 if reply_every and pk % reply_every == 0 else None)
+            for pk in range(start, end)
+        ]
+        yield page, ({"min_id": str(end)} if end <= total else None)
+
+
+def load_recorded(kind):
+    """
+    Recorded fixtures of one kind: "html" (rendered pages) or "media_info"
+    (raw media items). Returns a list, empty if nothing was recorded.
+    """
+    items = []
+    if kind == "html":
+        for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "html", "*.html"))):
+            with open(path, encoding="utf-8") as f:
+                items.append(f.read())
+    else:
+        for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, kind, "*.json"))):
+            with open(path, encoding="utf-8") as f:
+                items.append(json.load(f))
+    return items
+
+
+def import_from_cache(cache_dir=os.path.join("scrape", "cache")):
+    """
+    Copy responses saved by the scraper's response cache into benchmarks/fixtures/.
+
+    Returns the number of fixtures written.
+    """
+    count = 0
+    for path in glob.glob(os.path.join(cache_dir, "*", "*", "*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            continue
+
+        kind, key, value = entry.get("kind"), entry.get("key"), entry.get("value")
+        if kind == "scrapfly_html" and isinstance(value, str):
+            target = os.path.join(FIXTURES_DIR, "html", f"{key}.html")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, mode="w", encoding="utf-8") as f:
+                f.write(value)
+        elif kind == "media_info" and isinstance(value, dict):
+            target = os.path.join(FIXTURES_DIR, "media_info", f"{key}.json")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, mode="w", encoding="utf-8") as f:
+                json.dump(value, f)
+        else:
+            continue
+        count += 1
+    return count
+
+
+def clear_recorded():
+    """Remove every recorded fixture"""
+    shutil.rmtree(FIXTURES_DIR, ignore_errors=True)
@@ -0,0 +1,235 @@
+"""
+Offline benchmark suite for the scraper hot paths.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--sizes 100,10000,100000] [--no-memory]
+                                        [--save-baseline] [--compare] [--tolerance 0.25]
+                                        [--import-cache]
+
+Measures throughput and peak memory (tracemalloc) for HTML extraction,
+find_in_dict, payload normalization, comment row parsing and the CSV/XLSX
+exporters, using recorded fixtures when available and synthetic ones
+otherwise. --save-baseline stores the results in benchmarks/baseline.json;
+--compare checks the current run against it and exits with status 1 when a
+stage got slower (or hungrier) than the tolerance allows.
+"""
+import os
+import sys
+import copy
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+import fixtures
+from scraper_instagram import (
+    extract_media_data_from_html,
+    find_in_dict,
+    normalize_lists,
+    normalize_with_schema,
+    comment_row_from_raw,
+    LIST_FIELDS_THAT_MUST_BE_LISTS,
+    MEDIA_INFO_KEY,
+)
+from helpers.export_csv import export_to_csv
+from helpers.export_excel import export_to_excel_streaming
+
+BASELINE_FILE = os.path.join(HERE, "baseline.json")
+
+SAMPLE_METADATA = {
+    'Now': '2025-10-28 12:00:00',
+    'Post URL': 'https://www.instagram.com/reel/DQVNHKXEaWs/',
+    'Publisher Nickname': 'someone',
+    'Publisher @': '@someone',
+    'Publisher URL': 'https://instagram.com/someone',
+    'Publish Time': '2025-10-27 21:20:00',
+    'Post Likes': 1234,
+    'Post Shares': 0,
+    'Description': 'caption',
+    'Number of 1st level comments': 0,
+    'Number of 2nd level comments': 0,
+    'Total Comments (actual)': 0,
+    'Total Comments (platform says)': 0,
+    'Difference': 0,
+}
+
+
+def parse_rows(total):
+    """The comment parsing loop of scrape_with_instagrapi over `total` comments"""
+    rows = []
+    for page, _ in fixtures.iter_comment_pages(total):
+        rows.extend(comment_row_from_raw(raw, len(rows) + i) for i, raw in enumerate(page, 1))
+    return rows
+
+
+def measure(setup, fn, items, memory=True):
+    """
+    Run fn(setup()) once for timing and, optionally, once more under
+    tracemalloc. setup() runs before each pass, outside the measurement, so
+    cases that mutate their input start from a fresh copy every time.
+    """
+    inputs = setup()
+    started = time.perf_counter()
+    fn(inputs)
+    seconds = time.perf_counter() - started
+
+    peak_mb = None
+    if memory:
+        inputs = setup()
+        tracemalloc.start()
+        try:
+            fn(inputs)
+            peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "items": items,
+        "seconds": seconds,
+        "items_per_sec": items / seconds if seconds > 0 else None,
+        "peak_mb": peak_mb,
+    }
+
+
+def build_cases(sizes, repeat):
+    """
+    (name, setup, fn, item count) for every benchmark case. Inputs are built
+    by setup() only for the cases that actually run.
+    """
+    pages = fixtures.load_recorded("html") or [fixtures.synthetic_page()]
+    payloads = fixtures.load_recorded("media_info") or [fixtures.carousel_payload(), fixtures.clips_payload()]
+
+    def parsed_pages():
+        # find_in_dict works on the already-decoded script JSON
+        parsed = []
+        for html in pages:
+            start = html.find(MEDIA_INFO_KEY)
+            open_tag = html.rfind("<script", 0, start)
+            body = html[html.find(">", open_tag) + 1:html.find("</script>", start)]
+            try:
+                parsed.append(json.loads(body))
+            except ValueError:
+                pass
+        return parsed
+
+    no_setup = lambda: None
+    cases = [
+        ("extract_html", no_setup,
+         lambda _: [extract_media_data_from_html(p) for _ in range(repeat) for p in pages],
+         repeat * len(pages)),
+        ("find_in_dict", parsed_pages,
+         lambda parsed: [find_in_dict(d, MEDIA_INFO_KEY) for _ in range(repeat) for d in parsed],
+         repeat * len(parsed_pages())),
+    ]
+
+    # Fresh copies per pass: the normalizers mutate in place
+    def fresh_payloads():
+        return [copy.deepcopy(payloads) for _ in range(repeat)]
+
+    cases.append(("normalize_schema", fresh_payloads,
+                  lambda copies: [normalize_with_schema(p) for batch in copies for p in batch],
+                  repeat * len(payloads)))
+    cases.append(("normalize_full", fresh_payloads,
+                  lambda copies: [normalize_lists(p, LIST_FIELDS_THAT_MUST_BE_LISTS)
+                                  for batch in copies for p in batch],
+                  repeat * len(payloads)))
+
+    for size in sizes:
+        cases.append((f"parse_comments_{size}", no_setup, lambda _, size=size: parse_rows(size), size))
+
+    for size in sizes:
+        rows = lambda size=size: parse_rows(size)
+        cases.append((f"export_csv_{size}", rows,
+                      lambda rows: export_to_csv(SAMPLE_METADATA, rows, "bench", "bench"), size))
+        cases.append((f"export_xlsx_{size}", rows,
+                      lambda rows: export_to_excel_streaming(SAMPLE_METADATA, iter(rows), "bench", "bench"),
+                      size))
+
+    return cases
+
+
+def compare(results, baseline, tolerance):
+    """Regressions against the baseline: slower throughput or higher peak memory"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if previous.get("items_per_sec") and current.get("items_per_sec"):
+            if current["items_per_sec"] < previous["items_per_sec"] * (1 - tolerance):
+                regressions.append(
+                    f"{name}: {current['items_per_sec']:,.0f}/s vs baseline {previous['items_per_sec']:,.0f}/s"
+                )
+        if previous.get("peak_mb") and current.get("peak_mb"):
+            if current["peak_mb"] > previous["peak_mb"] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: peak {current['peak_mb']:.1f} MB vs baseline {previous['peak_mb']:.1f} MB"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="100,10000,100000",
+                        help="comment counts for parsing/export cases (e.g. 100,10000,1000000)")
+    parser.add_argument("--repeat", type=int, default=20, help="repetitions for the per-page cases")
+    parser.add_argument("--only", help="run only cases whose name contains this text")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--import-cache", action="store_true",
+                        help="copy responses from scrape/cache into benchmarks/fixtures first")
+    args = parser.parse_args()
+
+    if args.import_cache:
+        print(f"Imported {fixtures.import_from_cache()} recorded fixtures")
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    cases = build_cases(sizes, args.repeat)
+
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # The exporters write to ./scrape/<platform>/
+        os.chdir(workdir)
+        try:
+            print(f"{'case':<24} {'items':>9} {'seconds':>9} {'items/s':>12} {'peak MB':>9}")
+            for name, setup, fn, items in cases:
+                if args.only and args.only not in name:
+                    continue
+                result = measure(setup, fn, items, memory=not args.no_memory)
+                results[name] = result
+                peak = f"{result['peak_mb']:9.1f}" if result["peak_mb"] is not None else f"{'-':>9}"
+                rate = f"{result['items_per_sec']:12,.0f}" if result["items_per_sec"] else f"{'-':>12}"
+                print(f"{name:<24} {items:>9} {result['seconds']:9.3f} {rate} {peak}")
+        finally:
+            os.chdir(cwd)
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, mode="w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {BASELINE_FILE}")
+
+    if args.compare:
+        try:
+            with open(BASELINE_FILE, encoding="utf-8") as f:
+                baseline = json.load(f)
+        except (OSError, ValueError):
+            print("No baseline to compare against (run with --save-baseline first)")
+            return
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("REGRESSIONS:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import sqlite3
+from helpers.comment_record import dump_row, load_row, renumber
+
+# Base de datos local con el progreso de cada post (cursor + filas ya bajadas)
+CHECKPOINT_DB = os.path.join("scrape", "instagram", "checkpoints.sqlite")
+
+
+class CheckpointStore:
+    """
+    Checkpoint durable por post, guardado en SQLite.
+
+    Por cada shortcode se guarda el media_pk, el cursor de paginacion de la
+    siguiente pagina de comentarios y las filas ya obtenidas, de modo que un
+    crawl interrumpido pueda continuar exactamente donde se quedo.
+
+    Para el modo incremental tambien guarda, por media_pk, el comentario mas
+    nuevo ya exportado y las filas exportadas (para armar el archivo completo).
+    """
+
+    def __init__(self, path=CHECKPOINT_DB):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS posts (
+                shortcode TEXT PRIMARY KEY,
+                media_pk TEXT,
+                cursor TEXT,
+                next_number INTEGER NOT NULL DEFAULT 1,
+                done INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS rows (
+                shortcode TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                row TEXT NOT NULL,
+                PRIMARY KEY (shortcode, number)
+            );
+            CREATE TABLE IF NOT EXISTS watermarks (
+                media_pk TEXT PRIMARY KEY,
+                newest_pk INTEGER NOT NULL,
+                newest_ts REAL,
+                updated_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS exported (
+                media_pk TEXT NOT NULL,
+                comment_pk INTEGER NOT NULL,
+                row TEXT NOT NULL,
+                PRIMARY KEY (media_pk, comment_pk)
+            );
+        """)
+        self.conn.commit()
+
+    def get(self, shortcode):
+        """Estado guardado del post o None si no hay checkpoint"""
+        found = self.conn.execute(
+            "SELECT media_pk, cursor, next_number, done FROM posts WHERE shortcode = ?",
+            (shortcode,),
+        ).fetchone()
+        if not found:
+            return None
+
+        media_pk, cursor, next_number, done = found
+        return {
+            'media_pk': media_pk,
+            'cursor': json.loads(cursor) if cursor else None,
+            'next_number': next_number,
+            'done': bool(done),
+        }
+
+    def iter_rows(self, shortcode):
+        """Filas guardadas del post, en orden de numero de comentario"""
+        cursor = self.conn.execute(
+            "SELECT row FROM rows WHERE shortcode = ? ORDER BY number",
+            (shortcode,),
+        )
+        for (row,) in cursor:
+            yield load_row(row)
+
+    def save_page(self, shortcode, media_pk, rows, next_cursor):
+        """Guardar una pagina de filas y el cursor siguiente en una sola transaccion"""
+        next_number = rows[-1]['Comment Number'] + 1 if rows else None
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO rows (shortcode, number, row) VALUES (?, ?, ?)",
+                [(shortcode, r['Comment Number'], dump_row(r)) for r in rows],
+            )
+            self.conn.execute(
+                """
+                INSERT INTO posts (shortcode, media_pk, cursor, next_number, done, updated_at)
+                VALUES (?, ?, ?, COALESCE(?, 1), ?, ?)
+                ON CONFLICT(shortcode) DO UPDATE SET
+                    media_pk = excluded.media_pk,
+                    cursor = excluded.cursor,
+                    next_number = COALESCE(?, posts.next_number),
+                    done = excluded.done,
+                    updated_at = excluded.updated_at
+                """,
+                (
+                    shortcode, str(media_pk),
+                    json.dumps(next_cursor) if next_cursor else None,
+                    next_number, 0 if next_cursor else 1, time.time(),
+                    next_number,
+                ),
+            )
+
+    def reset(self, shortcode):
+        """Borrar el checkpoint de un post para empezar de cero"""
+        with self.conn:
+            self.conn.execute("DELETE FROM rows WHERE shortcode = ?", (shortcode,))
+            self.conn.execute("DELETE FROM posts WHERE shortcode = ?", (shortcode,))
+
+    def get_watermark(self, media_pk):
+        """(newest_pk, newest_ts) del ultimo export incremental, o None"""
+        found = self.conn.execute(
+            "SELECT newest_pk, newest_ts FROM watermarks WHERE media_pk = ?",
+            (str(media_pk),),
+        ).fetchone()
+        return tuple(found) if found else None
+
+    def save_exported(self, media_pk, rows_with_pk):
+        """
+        Guardar comentarios exportados en modo incremental y avanzar la marca.
+
+        La marca solo considera comentarios de primer nivel: las respuestas
+        tienen pks mas nuevos que comentarios que todavia no se bajaron.
+
+        Args:
+            media_pk: ID del post
+            rows_with_pk: Lista de tuplas (comment_pk, created_ts, row)
+        """
+        if not rows_with_pk:
+            return
+        top_level = [r for r in rows_with_pk if not r[2].get('Is 2nd Level Comment')]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO exported (media_pk, comment_pk, row) VALUES (?, ?, ?)",
+                [(str(media_pk), pk, dump_row(row)) for pk, _, row in rows_with_pk],
+            )
+            if not top_level:
+                return
+            newest_pk, newest_ts, _ = max(top_level, key=lambda r: r[0])
+            self.conn.execute(
+                """
+                INSERT INTO watermarks (media_pk, newest_pk, newest_ts, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(media_pk) DO UPDATE SET
+                    newest_pk = MAX(watermarks.newest_pk, excluded.newest_pk),
+                    newest_ts = MAX(COALESCE(watermarks.newest_ts, 0), COALESCE(excluded.newest_ts, 0)),
+                    updated_at = excluded.updated_at
+                """,
+                (str(media_pk), newest_pk, newest_ts, time.time()),
+            )
+
+    def iter_exported(self, media_pk):
+        """Todos los comentarios exportados del post, del mas antiguo al mas nuevo"""
+        cursor = self.conn.execute(
+            "SELECT row FROM exported WHERE media_pk = ? ORDER BY comment_pk",
+            (str(media_pk),),
+        )
+        for (row,) in cursor:
+            yield load_row(row)
+
+    def close(self):
+        self.conn.close()
+
+
+class CheckpointComments:
+    """
+    Comentarios de un post leidos del checkpoint recien al iterar.
+
+    El scraper guarda cada pagina en el checkpoint; en vez de juntar todas
+    las filas en una lista, los exportadores recorren esta vista, que las
+    lee de SQLite de a una (con su propia conexion, asi puede usarse desde
+    otro hilo) y les asigna el Comment Number final. skip_numbers son las
+    filas guardadas que no van al archivo (descartadas por dedupe) y
+    extra_rows se agregan al final (las respuestas).
+    """
+
+    def __init__(self, shortcode, count, skip_numbers=(), extra_rows=(), path=None):
+        self.shortcode = shortcode
+        self.count = count
+        self.skip_numbers = set(skip_numbers)
+        self.extra_rows = list(extra_rows)
+        self.path = path or CHECKPOINT_DB
+
+    def __len__(self):
+        return self.count + len(self.extra_rows)
+
+    def __iter__(self):
+        store = CheckpointStore(self.path)
+        try:
+            number = 0
+            for row in store.iter_rows(self.shortcode):
+                if row['Comment Number'] in self.skip_numbers:
+                    continue
+                number += 1
+                renumber([row], start=number)
+                yield row
+        finally:
+            store.close()
+        yield from self.extra_rows
+
@@ -0,0 +1,138 @@
+import sys
+import json
+from collections.abc import Mapping
+from datetime import datetime, timezone
+
+# Columnas de comentario que ven los exportadores, en orden
+COMMENT_COLUMNS = (
+    'Comment Number',
+    'User @',
+    'User URL',
+    'Comment',
+    'Comment Likes',
+    'Comment Time',
+    'Is 2nd Level Comment',
+    'Parent Comment Number',
+)
+
+# Columnas extra cuando se enriquecen los perfiles de quienes comentan
+PROFILE_COLUMNS = (
+    'User Followers',
+    'User Verified',
+    'User Account Type',
+)
+
+
+def _format_time(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%d %H:%M:%S') if ts else ''
+
+
+# Columna -> como calcularla a partir de los campos crudos
+_COLUMN_GETTERS = {
+    'Comment Number': lambda r: r.number,
+    'User @': lambda r: f'@{r.username}',
+    'User URL': lambda r: f'https://instagram.com/{r.username}',
+    'Comment': lambda r: r.text,
+    'Comment Likes': lambda r: r.likes,
+    'Comment Time': lambda r: _format_time(r.created_at),
+    'Is 2nd Level Comment': lambda r: r.is_reply,
+    'Parent Comment Number': lambda r: r.parent if r.parent is not None else '',
+}
+for _index, _column in enumerate(PROFILE_COLUMNS):
+    # profile es una tupla en el orden de PROFILE_COLUMNS, o () si no se pudo obtener
+    _COLUMN_GETTERS[_column] = lambda r, i=_index: r.profile[i] if r.profile else ''
+
+
+class CommentRecord(Mapping):
+    """
+    Comentario compacto: guarda solo los campos crudos en __slots__.
+
+    Se comporta como el dict de columnas que esperan los exportadores
+    (keys/get/[]), pero las URLs y la fecha formateada se arman recien al
+    leer cada columna, es decir al exportar. Ocupa una fraccion de un dict
+    de siete claves con tres strings ya formateados.
+    """
+
+    __slots__ = ("number", "username", "text", "likes", "created_at", "is_reply",
+                 "pk", "parent", "child_count", "user_pk", "profile")
+
+    def __init__(self, number, username, text, likes, created_at, is_reply,
+                 pk=None, parent=None, child_count=0, user_pk=None):
+        self.number = number
+        self.username = username
+        self.text = text
+        self.likes = likes
+        self.created_at = created_at
+        self.is_reply = is_reply
+        self.pk = pk                    # ID del comentario en Instagram
+        self.parent = parent            # Comment Number del comentario padre (respuestas)
+        self.child_count = child_count  # respuestas que dice tener la API
+        self.user_pk = user_pk          # ID de quien comenta
+        self.profile = None             # perfil enriquecido (ver PROFILE_COLUMNS)
+
+    @classmethod
+    def from_raw(cls, raw, number, parent=None):
+        """Crear el registro desde un comentario crudo de la API"""
+        user = raw.get("user") or {}
+        username = user.get("username", "")
+        pk = raw.get("pk")
+        user_pk = user.get("pk") or raw.get("user_id")
+        return cls(
+            number,
+            # Los mismos usuarios comentan muchas veces: compartir el string
+            sys.intern(username) if username else "",
+            raw.get("text", ""),
+            raw.get("comment_like_count", 0),
+            raw.get("created_at_utc") or raw.get("created_at"),
+            parent is not None or bool(raw.get("parent_comment_id") or raw.get("replied_to_comment_id")),
+            int(pk) if pk else None,
+            parent,
+            raw.get("child_comment_count") or 0,
+            int(user_pk) if user_pk else None,
+        )
+
+    def __getitem__(self, key):
+        return _COLUMN_GETTERS[key](self)
+
+    def get(self, key, default=None):
+        getter = _COLUMN_GETTERS.get(key)
+        return getter(self) if getter else default
+
+    def __iter__(self):
+        return iter(COMMENT_COLUMNS + PROFILE_COLUMNS if self.profile is not None else COMMENT_COLUMNS)
+
+    def __len__(self):
+        return len(COMMENT_COLUMNS) + (len(PROFILE_COLUMNS) if self.profile is not None else 0)
+
+    def __repr__(self):
+        return f"CommentRecord({self.number}, @{self.username}, {self.text[:30]!r})"
+
+    def to_state(self):
+        """Campos crudos como lista (para guardar en el checkpoint)"""
+        return [self.number, self.username, self.text, self.likes, self.created_at, self.is_reply,
+                self.pk, self.parent, self.child_count, self.user_pk]
+
+
+def dump_row(row):
+    """Serializar una fila (CommentRecord o dict) para guardarla en SQLite"""
+    if isinstance(row, CommentRecord):
+        return json.dumps(row.to_state(), ensure_ascii=False)
+    return json.dumps(row, ensure_ascii=False)
+
+
+def load_row(text):
+    """Inverso de dump_row; las filas guardadas como dict se devuelven tal cual"""
+    value = json.loads(text)
+    if isinstance(value, list):
+        return CommentRecord(*value)
+    return value
+
+
+def renumber(rows, start=1):
+    """Numerar las filas start..n, sean CommentRecord o dicts"""
+    for number, row in enumerate(rows, start):
+        if isinstance(row, CommentRecord):
+            row.number = number
+        else:
+            row['Comment Number'] = number
+    return rows
@@ -2,10 +2,26 @@ import sys
 import os
 import re
 import datetime
-from dotenv import load_dotenv
 
-# Cargar variables de entorno desde el archivo .env
-load_dotenv()
+def _find_dotenv():
+    """El .env mas cercano subiendo desde esta carpeta (igual que load_dotenv()), o None"""
+    path = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        candidate = os.path.join(path, '.env')
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+# Cargar variables de entorno desde el archivo .env. Se hace al importar porque
+# los demas modulos leen su configuracion del entorno; python-dotenv solo se
+# importa si hay un .env que cargar
+_ENV_FILE = _find_dotenv()
+if _ENV_FILE:
+    from dotenv import load_dotenv
+    load_dotenv(_ENV_FILE)
 
 # === Scrapfly API Key ===
 # La clave API se lee desde el archivo .env por seguridad
@@ -15,6 +31,67 @@ if not SCRAPFLY_KEY:
     SCRAPFLY_KEY = None  # Permitir None para Instagram con instagrapi
     print("⚠️ WARNING: No SCRAPFLY_API_KEY found (OK if using Instagram with credentials)")
 
+# === Servicio local de pruebas (benchmarks/fake_service.py) ===
+# Si esta definida, Instagram y Scrapfly se reemplazan por el servicio local
+FAKE_SERVICE_URL = os.getenv('FAKE_SERVICE_URL') or None
+
+def load_instagram_accounts(username=None, password=None):
+    """
+    Lista de cuentas (username, password) para el modo multi-cuenta.
+
+    Combina la cuenta ingresada por el usuario con las definidas en
+    INSTAGRAM_ACCOUNTS con el formato "user1:pass1,user2:pass2".
+    """
+    accounts = []
+    if username and password:
+        accounts.append((username, password))
+
+    for entry in os.getenv('INSTAGRAM_ACCOUNTS', '').split(','):
+        entry = entry.strip()
+        if ':' not in entry:
+            continue
+        user, pwd = entry.split(':', 1)
+        user, pwd = user.strip(), pwd.strip()
+        if user and pwd and user not in [a[0] for a in accounts]:
+            accounts.append((user, pwd))
+
+    return accounts
+
+# instagram.com/p/<code>, /reel/, /reels/, /tv/ y /<usuario>/p/<code>
+INSTAGRAM_POST_RE = re.compile(r'instagram\.com/(?:[\w.]+/)?(p|reels?|tv)/([A-Za-z0-9_-]+)', re.IGNORECASE)
+
+def canonicalize_instagram_url(url):
+    """
+    Shortcode y URL canonica de un link de Instagram.
+
+    Quita query strings, subdominios y variantes (/reels/, /tv/, /<usuario>/p/)
+    para que el mismo post no se scrapee dos veces.
+
+    Returns:
+        tuple: (shortcode, url) o None si el link no es un post/reel
+    """
+    match = INSTAGRAM_POST_RE.search(str(url).strip())
+    if not match:
+        return None
+    kind, shortcode = match.group(1).lower(), match.group(2)
+    kind = "reel" if kind.startswith("reel") else "p"
+    return shortcode, f"https://www.instagram.com/{kind}/{shortcode}/"
+
+def load_secrets_file(path):
+    """
+    Cargar credenciales desde un archivo con formato .env (KEY=VALUE).
+
+    Admite INSTAGRAM_USERNAME, INSTAGRAM_PASSWORD, INSTAGRAM_ACCOUNTS y
+    SCRAPFLY_API_KEY; sus valores reemplazan a los del entorno.
+    """
+    from dotenv import load_dotenv
+
+    global SCRAPFLY_KEY
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Secrets file not found: {path}")
+    load_dotenv(path, override=True)
+    SCRAPFLY_KEY = os.getenv('SCRAPFLY_API_KEY') or SCRAPFLY_KEY
+
 def validate_links(links, platform):
     if len(links) > 10:
         print("Error: El máximo de links permitidos por ejecución es 10.")
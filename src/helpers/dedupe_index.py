@@ -0,0 +1,88 @@
+import os
+import time
+import sqlite3
+import threading
+
+# Indice de comentarios ya exportados, compartido entre ejecuciones
+SEEN_DB = os.path.join("scrape", "instagram", "seen_comments.sqlite")
+
+
+class SeenCommentIndex:
+    """
+    Indice persistente de comment pks ya vistos por media_pk.
+
+    Los pks de un post se cargan en un set la primera vez que se consulta,
+    asi cada chequeo es O(1). Los pks nuevos quedan pendientes hasta
+    commit(), que los guarda en SQLite cuando el post se scrapeo completo:
+    si la ejecucion se corta antes, esos comentarios se vuelven a exportar.
+    """
+
+    def __init__(self, path=SEEN_DB):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS seen (
+                media_pk TEXT NOT NULL,
+                comment_pk INTEGER NOT NULL,
+                first_seen REAL,
+                PRIMARY KEY (media_pk, comment_pk)
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+        self.lock = threading.Lock()
+        self.seen = {}      # media_pk -> set de pks (guardados + pendientes)
+        self.pending = {}   # media_pk -> lista de pks nuevos sin guardar
+
+    def _load(self, media_pk):
+        media_pk = str(media_pk)
+        pks = self.seen.get(media_pk)
+        if pks is None:
+            cursor = self.conn.execute("SELECT comment_pk FROM seen WHERE media_pk = ?", (media_pk,))
+            pks = self.seen[media_pk] = {pk for (pk,) in cursor}
+            self.pending[media_pk] = []
+        return media_pk, pks
+
+    def add(self, media_pk, comment_pk):
+        """Marcar un comentario como visto. Devuelve False si ya lo estaba (duplicado)"""
+        if not comment_pk:
+            return True
+        comment_pk = int(comment_pk)
+        with self.lock:
+            media_pk, pks = self._load(media_pk)
+            if comment_pk in pks:
+                return False
+            pks.add(comment_pk)
+            self.pending[media_pk].append(comment_pk)
+            return True
+
+    def known(self, media_pk):
+        """Cantidad de comentarios del post ya registrados"""
+        with self.lock:
+            return len(self._load(media_pk)[1])
+
+    def commit(self, media_pk):
+        """Guardar los pks pendientes del post y liberar su set de memoria"""
+        media_pk = str(media_pk)
+        with self.lock:
+            pending = self.pending.pop(media_pk, [])
+            self.seen.pop(media_pk, None)
+            if not pending:
+                return 0
+            now = time.time()
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO seen (media_pk, comment_pk, first_seen) VALUES (?, ?, ?)",
+                    [(media_pk, pk, now) for pk in pending],
+                )
+            return len(pending)
+
+    def discard(self, media_pk):
+        """Olvidar los pks pendientes del post (el scrape fallo)"""
+        media_pk = str(media_pk)
+        with self.lock:
+            self.pending.pop(media_pk, None)
+            self.seen.pop(media_pk, None)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,24 @@
+import os
+import json
+
+
+def iter_flat_rows(metadata, comments):
+    """
+    Filas planas para formatos de carga masiva: una fila por comentario,
+    con la URL del post como primera columna para poder unir con los metadatos.
+    """
+    post_url = metadata.get('Post URL', '')
+    for c in comments:
+        row = {'Post URL': post_url}
+        row.update((k, c.get(k, "")) for k in c.keys())
+        yield row
+
+
+def write_metadata_sidecar(metadata, platform, filename, outdir=None):
+    """Guardar los metadatos del post junto al archivo de comentarios"""
+    outdir = outdir or os.path.join("scrape", platform)
+    os.makedirs(outdir, exist_ok=True)
+    filepath = os.path.join(outdir, filename + ".meta.json")
+    with open(filepath, mode="w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2, default=str)
+    return filepath
@@ -1,9 +1,10 @@
 import csv
 import os
 
-def export_to_csv(metadata, comments, platform, filename):
-    os.makedirs(f"scrape/{platform}", exist_ok=True)
-    filepath = os.path.join(f"scrape/{platform}", filename + ".csv")
+def export_to_csv(metadata, comments, platform, filename, outdir=None):
+    outdir = outdir or os.path.join("scrape", platform)
+    os.makedirs(outdir, exist_ok=True)
+    filepath = os.path.join(outdir, filename + ".csv")
 
     with open(filepath, mode="w", encoding="utf-8", newline="") as f:
         writer = csv.writer(f)
@@ -16,12 +17,62 @@ def export_to_csv(metadata, comments, platform, filename):
         # Separador
         writer.writerow([])
 
-        # Escribir comentarios
-        if comments:
-            comment_headers = list(comments[0].keys())
-            writer.writerow(comment_headers)
-            for c in comments:
-                writer.writerow([c.get(k, "") for k in comment_headers])
+        # Escribir comentarios (cualquier iterable: se escriben a medida que llegan)
+        comment_headers = None
+        for c in comments:
+            if comment_headers is None:
+                comment_headers = list(c.keys())
+                writer.writerow(comment_headers)
+            writer.writerow([c.get(k, "") for k in comment_headers])
 
     print(f"[OK] CSV exportado: {filepath}")
-    return filepath
\ No newline at end of file
+    return filepath
+
+def export_to_csv_compressed(metadata, comments, platform, filename, compression="gzip", outdir=None):
+    """
+    Exportar comentarios a CSV comprimido (gzip o zstd) para carga masiva.
+
+    A diferencia de export_to_csv, el archivo tiene un unico header y una fila
+    por comentario (con la URL del post como primera columna); los metadatos
+    del post van aparte en <filename>.meta.json. Acepta un generador de
+    comentarios y escribe en streaming. zstd requiere el paquete zstandard.
+    """
+    import io
+    from helpers.export_common import iter_flat_rows, write_metadata_sidecar
+
+    outdir = outdir or os.path.join("scrape", platform)
+    os.makedirs(outdir, exist_ok=True)
+
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            print("Error: zstandard no esta instalado. Instalalo con: pip install zstandard")
+            raise
+        filepath = os.path.join(outdir, filename + ".csv.zst")
+        raw = open(filepath, "wb")
+        stream = zstandard.ZstdCompressor().stream_writer(raw)
+    else:
+        import gzip
+        filepath = os.path.join(outdir, filename + ".csv.gz")
+        raw = None
+        stream = gzip.open(filepath, "wb")
+
+    count = 0
+    try:
+        with io.TextIOWrapper(stream, encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            headers = None
+            for row in iter_flat_rows(metadata, comments):
+                if headers is None:
+                    headers = list(row.keys())
+                    writer.writerow(headers)
+                writer.writerow([row.get(k, "") for k in headers])
+                count += 1
+    finally:
+        if raw is not None:
+            raw.close()
+
+    write_metadata_sidecar(metadata, platform, filename, outdir)
+    print(f"[OK] CSV ({compression}) exportado: {filepath} ({count} comentarios)")
+    return filepath
@@ -1,9 +1,7 @@
 import os
 import re
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
 
-def export_to_excel(metadata, comments, platform, filename):
+def export_to_excel(metadata, comments, platform, filename, outdir=None):
     """
     Exportar datos scrapeados a archivo Excel (.xlsx)
     
@@ -12,12 +10,18 @@ def export_to_excel(metadata, comments, platform, filename):
         comments: Lista de dicts con comentarios
         platform: Nombre de la plataforma (instagram, tiktok, etc)
         filename: Nombre base del archivo (sin extension)
+        outdir: Carpeta de salida (por defecto scrape/<platform>)
     
     Returns:
         str: Ruta completa del archivo guardado
     """
-    os.makedirs(f"scrape/{platform}", exist_ok=True)
-    filepath = os.path.join(f"scrape/{platform}", filename + ".xlsx")
+    # openpyxl se importa solo cuando se exporta a Excel
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
+
+    outdir = outdir or os.path.join("scrape", platform)
+    os.makedirs(outdir, exist_ok=True)
+    filepath = os.path.join(outdir, filename + ".xlsx")
 
     wb = Workbook()
     ws = wb.active
@@ -60,11 +64,86 @@ def export_to_excel(metadata, comments, platform, filename):
         print(f"Error al guardar Excel: {e}")
         # Intentar con nombre de archivo seguro (sin caracteres especiales)
         safe_filename = re.sub(r'[^\w\-_\. ]', '_', filename)
-        safe_filepath = os.path.join(f"scrape/{platform}", safe_filename + ".xlsx")
+        safe_filepath = os.path.join(outdir, safe_filename + ".xlsx")
         try:
             wb.save(safe_filepath)
             print(f"[OK] XLSX exportado con nombre seguro: {safe_filepath}")
             return safe_filepath
         except Exception as e2:
             print(f"Error critico al guardar Excel: {e2}")
-            raise
\ No newline at end of file
+            raise
+
+def export_to_excel_streaming(metadata, comments, platform, filename, outdir=None):
+    """
+    Exportar a Excel (.xlsx) en modo write-only, fila por fila.
+
+    Misma disposicion que export_to_excel (metadatos en columnas 1-14,
+    comentarios desde la columna 17) pero acepta cualquier iterable de
+    comentarios (p.ej. un generador) y no guarda las celdas en memoria,
+    por lo que el consumo se mantiene estable sin importar la cantidad.
+
+    Args:
+        metadata: Dict con metadatos del post
+        comments: Iterable de dicts con comentarios
+        platform: Nombre de la plataforma (instagram, tiktok, etc)
+        filename: Nombre base del archivo (sin extension)
+        outdir: Carpeta de salida (por defecto scrape/<platform>)
+
+    Returns:
+        str: Ruta completa del archivo guardado
+    """
+    import time
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment
+
+    outdir = outdir or os.path.join("scrape", platform)
+    os.makedirs(outdir, exist_ok=True)
+    # Un workbook write-only solo se puede guardar una vez: usar nombre seguro desde el inicio
+    safe_filename = re.sub(r'[^\w\-_\. ]', '_', filename)
+    filepath = os.path.join(outdir, safe_filename + ".xlsx")
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+
+    def header_cell(value, color):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.font = Font(bold=True)
+        cell.fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+        cell.alignment = Alignment(horizontal="center")
+        return cell
+
+    comments = iter(comments)
+    first_comment = next(comments, None)
+
+    # Dejar columnas 15 y 16 vacias
+    start_col = 17
+
+    # Fila 1: headers de metadatos + headers de comentarios
+    metadata_headers = list(metadata.keys())
+    header_row = [header_cell(h, "DDDDDD") for h in metadata_headers]
+    comment_headers = list(first_comment.keys()) if first_comment else []
+    if comment_headers:
+        header_row += [None] * (start_col - 1 - len(header_row))
+        header_row += [header_cell(h, "CCCCCC") for h in comment_headers]
+    ws.append(header_row)
+
+    # Fila 2: valores de metadatos
+    ws.append([metadata.get(h, "") for h in metadata_headers])
+
+    # Filas 3+: comentarios desde la columna 17
+    padding = [None] * (start_col - 1)
+    started = time.perf_counter()
+    rows_written = 0
+    if first_comment is not None:
+        ws.append(padding + [first_comment.get(h, "") for h in comment_headers])
+        rows_written = 1
+        for comment in comments:
+            ws.append(padding + [comment.get(h, "") for h in comment_headers])
+            rows_written += 1
+
+    wb.save(filepath)
+    elapsed = time.perf_counter() - started
+    rate = rows_written / elapsed if elapsed > 0 else 0
+    print(f"[OK] XLSX exportado: {filepath} ({rows_written} comentarios, {rate:,.0f} filas/seg)")
+    return filepath
@@ -0,0 +1,25 @@
+import os
+import json
+from helpers.export_common import iter_flat_rows, write_metadata_sidecar
+
+def export_to_jsonl(metadata, comments, platform, filename, outdir=None):
+    """
+    Exportar comentarios a JSON Lines (.jsonl), un objeto por linea.
+
+    Acepta cualquier iterable de comentarios y escribe a medida que llegan.
+    Los metadatos del post se guardan aparte en <filename>.meta.json.
+    """
+    outdir = outdir or os.path.join("scrape", platform)
+    os.makedirs(outdir, exist_ok=True)
+    filepath = os.path.join(outdir, filename + ".jsonl")
+
+    count = 0
+    with open(filepath, mode="w", encoding="utf-8") as f:
+        for row in iter_flat_rows(metadata, comments):
+            f.write(json.dumps(row, ensure_ascii=False, default=str))
+            f.write("\n")
+            count += 1
+
+    write_metadata_sidecar(metadata, platform, filename, outdir)
+    print(f"[OK] JSONL exportado: {filepath} ({count} comentarios)")
+    return filepath
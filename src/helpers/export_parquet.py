@@ -0,0 +1,98 @@
+import os
+from datetime import datetime, timezone
+from helpers.export_common import iter_flat_rows, write_metadata_sidecar
+
+# Filas por row group al escribir en streaming
+BATCH_SIZE = 50000
+
+# Tipos de las columnas conocidas; cualquier otra columna se guarda como texto
+COLUMN_TYPES = {
+    'Comment Number': 'int',
+    'Comment Likes': 'int',
+    'Comment Time': 'timestamp',
+    'Is 2nd Level Comment': 'bool',
+    'Parent Comment Number': 'int',
+    'User Followers': 'int',
+    'User Verified': 'bool',
+}
+
+
+def _convert(value, kind):
+    if value in ("", None):
+        return None
+    if kind == 'int':
+        return int(value)
+    if kind == 'bool':
+        return bool(value)
+    if kind == 'timestamp':
+        if isinstance(value, datetime):
+            return value
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    return str(value)
+
+
+def export_to_parquet(metadata, comments, platform, filename, outdir=None):
+    """
+    Exportar comentarios a Parquet con columnas tipadas.
+
+    Likes como enteros, tiempos como timestamp UTC y la marca de respuesta
+    como booleano. Los comentarios se escriben por lotes de BATCH_SIZE, asi
+    que acepta un generador sin cargar todo en memoria. Requiere pyarrow.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("Error: pyarrow no esta instalado. Instalalo con: pip install pyarrow")
+        raise
+
+    arrow_types = {
+        'int': pa.int64(),
+        'bool': pa.bool_(),
+        'timestamp': pa.timestamp('s', tz='UTC'),
+        'str': pa.string(),
+    }
+
+    outdir = outdir or os.path.join("scrape", platform)
+    os.makedirs(outdir, exist_ok=True)
+    filepath = os.path.join(outdir, filename + ".parquet")
+
+    writer = None
+    columns = None
+    batch = None
+    count = 0
+
+    def flush():
+        nonlocal writer
+        table = pa.table(
+            {name: pa.array(values, type=arrow_types[COLUMN_TYPES.get(name, 'str')])
+             for name, values in batch.items()}
+        )
+        if writer is None:
+            writer = pq.ParquetWriter(filepath, table.schema, compression="snappy")
+        writer.write_table(table)
+
+    try:
+        for row in iter_flat_rows(metadata, comments):
+            if columns is None:
+                columns = list(row.keys())
+                batch = {name: [] for name in columns}
+            for name in columns:
+                batch[name].append(_convert(row.get(name), COLUMN_TYPES.get(name, 'str')))
+            count += 1
+            if count % BATCH_SIZE == 0:
+                flush()
+                batch = {name: [] for name in columns}
+
+        if columns is None:
+            columns = ['Post URL']
+            batch = {'Post URL': []}
+        if writer is None or batch[columns[0]]:
+            flush()
+    finally:
+        if writer is not None:
+            writer.close()
+
+    write_metadata_sidecar(metadata, platform, filename, outdir)
+    print(f"[OK] Parquet exportado: {filepath} ({count} comentarios)")
+    return filepath
@@ -0,0 +1,127 @@
+import json
+from types import SimpleNamespace
+
+# Cliente para el servicio local de pruebas (benchmarks/fake_service.py).
+# Reemplaza la parte de red de instagrapi y de Scrapfly para poder medir
+# concurrencia, reintentos y backoff sin tocar los servicios reales.
+# Los nombres de las excepciones imitan a los de instagrapi para que la
+# politica de reintentos las clasifique igual.
+
+
+class FakeServiceError(Exception):
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+
+class LoginRequired(FakeServiceError):
+    pass
+
+
+class ChallengeRequired(FakeServiceError):
+    pass
+
+
+class ClientThrottledError(FakeServiceError):
+    pass
+
+
+class ClientUnauthorizedError(FakeServiceError):
+    pass
+
+
+class ClientConnectionError(FakeServiceError):
+    pass
+
+
+def _raise_for_response(resp):
+    try:
+        body = resp.json()
+    except ValueError:
+        body = {}
+    message = body.get("message") or resp.reason or f"HTTP {resp.status_code}"
+
+    if resp.status_code == 429:
+        raise ClientThrottledError(message, resp)
+    if message == "challenge_required":
+        raise ChallengeRequired(message, resp)
+    if message == "login_required":
+        raise LoginRequired(message, resp)
+    if resp.status_code in (401, 403):
+        raise ClientUnauthorizedError(message, resp)
+    if resp.status_code >= 400:
+        raise FakeServiceError(message, resp)
+    return body
+
+
+def point_instagrapi_at(cl, base_url):
+    """
+    Redirigir un cliente de instagrapi al servicio local.
+
+    Se reemplazan private_request, login y get_timeline_feed; el resto del
+    cliente (media_pk_from_code, settings, extractores) sigue siendo el real.
+    """
+    import requests
+
+    base_url = base_url.rstrip("/")
+    session = requests.Session()
+
+    def private_request(endpoint, data=None, params=None, **kwargs):
+        url = f"{base_url}/api/v1/{endpoint}"
+        try:
+            if data is not None:
+                resp = session.post(url, data=data, params=params, timeout=60)
+            else:
+                resp = session.get(url, params=params, timeout=60)
+        except requests.RequestException as e:
+            raise ClientConnectionError(str(e))
+        return _raise_for_response(resp)
+
+    def login(username=None, password=None, relogin=False, **kwargs):
+        private_request("accounts/login/", data={"username": username, "password": password})
+        cl.username = username
+        return True
+
+    def get_timeline_feed(*args, **kwargs):
+        return private_request("feed/timeline/")
+
+    cl.private_request = private_request
+    cl.login = login
+    cl.get_timeline_feed = get_timeline_feed
+    cl.delay_range = None
+    return cl
+
+
+class FakeScrapflyClient:
+    """Mismo uso que ScrapflyClient.scrape(config), contra el servicio local"""
+
+    def __init__(self, host):
+        import requests
+
+        self.host = host.rstrip("/")
+        self.session = requests.Session()
+        self.request_error = requests.RequestException
+
+    def scrape(self, config):
+        params = {
+            "url": getattr(config, "url", None) or config["url"],
+            "render_js": json.dumps(bool(_config_value(config, "render_js"))),
+            "asp": json.dumps(bool(_config_value(config, "asp"))),
+        }
+        try:
+            resp = self.session.get(f"{self.host}/scrape", params=params, timeout=120)
+        except self.request_error as e:
+            raise ClientConnectionError(str(e))
+        body = _raise_for_response(resp)
+        result = body.get("result", {})
+        return SimpleNamespace(
+            content=result.get("content", ""),
+            context=body.get("context", {}),
+            headers=resp.headers,
+        )
+
+
+def _config_value(config, name):
+    if isinstance(config, dict):
+        return config.get(name)
+    return getattr(config, name, None)
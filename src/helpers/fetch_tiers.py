@@ -0,0 +1,95 @@
+import os
+import json
+import threading
+
+# Tiers de Scrapfly, del mas barato al mas caro
+FETCH_TIERS = [
+    {"name": "plain", "render_js": False, "asp": False},
+    {"name": "asp", "render_js": False, "asp": True},
+    {"name": "render", "render_js": True, "asp": True, "rendering_wait": 3000},
+]
+
+TIER_STATS_FILE = os.path.join("scrape", "instagram", "fetch_tiers.json")
+
+# Cada cuantos fetches de un patron se vuelve a probar desde el tier mas barato
+# (un tier caro que sirvio una vez no queda fijo para siempre)
+REPROBE_EVERY = int(os.getenv("SCRAPFLY_REPROBE_EVERY", "20"))
+
+
+class TierStats:
+    """
+    Registro de que tier funciono por patron de URL (p, reel, reels) y de
+    la latencia y el costo en creditos de cada tier. Se guarda en JSON para
+    que la siguiente ejecucion empiece directamente por el tier que sirvio;
+    cada REPROBE_EVERY fetches se vuelve a empezar por el mas barato.
+    """
+
+    def __init__(self, path=TIER_STATS_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.best_tier = {}
+        self.tiers = {}
+        self.since_probe = {}    # fetches por patron desde el ultimo reintento del tier barato
+        try:
+            with open(path, encoding="utf-8") as f:
+                stored = json.load(f)
+            self.best_tier = stored.get("best_tier", {})
+            self.tiers = stored.get("tiers", {})
+            self.since_probe = stored.get("since_probe", {})
+        except (OSError, ValueError):
+            pass
+
+    def start_index(self, pattern):
+        """Indice del tier por el que conviene empezar para este patron"""
+        with self.lock:
+            name = self.best_tier.get(pattern)
+            idx = next((i for i, tier in enumerate(FETCH_TIERS) if tier["name"] == name), 0)
+            if idx == 0:
+                return 0
+            count = self.since_probe.get(pattern, 0) + 1
+            if count >= REPROBE_EVERY:
+                # Probar otra vez desde el tier mas barato; si sirve, record_winner lo fija
+                self.since_probe[pattern] = 0
+                return 0
+            self.since_probe[pattern] = count
+            return idx
+
+    def record(self, tier_name, seconds, cost, success):
+        with self.lock:
+            stats = self.tiers.setdefault(
+                tier_name, {"attempts": 0, "successes": 0, "seconds": 0.0, "credits": 0}
+            )
+            stats["attempts"] += 1
+            stats["successes"] += int(success)
+            stats["seconds"] += seconds
+            stats["credits"] += cost or 0
+
+    def record_winner(self, pattern, tier_name):
+        with self.lock:
+            self.best_tier[pattern] = tier_name
+
+    def save(self):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Archivo temporal + replace: un corte a mitad de escritura no deja JSON roto
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, mode="w", encoding="utf-8") as f:
+                json.dump({"best_tier": self.best_tier, "tiers": self.tiers,
+                           "since_probe": self.since_probe}, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def report(self):
+        """Resumen de latencia media y creditos por tier"""
+        lines = ["Scrapfly tiers (latency / credits per request):"]
+        for tier in FETCH_TIERS:
+            stats = self.tiers.get(tier["name"])
+            if not stats or not stats["attempts"]:
+                continue
+            attempts = stats["attempts"]
+            lines.append(
+                f"   {tier['name']:<7} {attempts:>5} req, {stats['successes']:>5} ok, "
+                f"{stats['seconds'] / attempts:6.2f}s avg, {stats['credits'] / attempts:6.1f} credits avg"
+            )
+        if self.best_tier:
+            lines.append("   best tier: " + ", ".join(f"/{p}/ -> {t}" for p, t in sorted(self.best_tier.items())))
+        return "\n".join(lines)
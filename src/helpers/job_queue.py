@@ -0,0 +1,229 @@
+import json
+import time
+import uuid
+import queue
+import threading
+import itertools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Estados de un job
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Jobs terminados que se conservan en memoria para consultar su estado
+MAX_FINISHED_JOBS = 1000
+
+
+class Job:
+    def __init__(self, spec, priority=0):
+        self.id = uuid.uuid4().hex[:12]
+        self.spec = spec
+        self.priority = priority
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.entries = []     # resultado por URL (mismo formato que el manifest)
+        self.summary = None
+        self.error = None
+
+    def to_dict(self, with_entries=True):
+        data = {
+            "id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "links": len(self.spec.get("links", [])),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "summary": self.summary,
+            "error": self.error,
+        }
+        if with_entries:
+            data["entries"] = list(self.entries)
+        return data
+
+
+class JobQueue:
+    """
+    Cola de jobs con prioridad (menor numero = antes; FIFO a igual prioridad)
+    ejecutados por `workers` hilos con run_job(job). prepare(spec) valida y
+    normaliza el pedido antes de encolarlo (ValueError si es invalido).
+    """
+
+    def __init__(self, run_job, prepare=None, workers=1):
+        self.run_job = run_job
+        self.prepare = prepare
+        self.workers = max(1, workers)
+        self.pending = queue.PriorityQueue()
+        self.order = itertools.count()
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.threads = []
+
+    def submit(self, spec):
+        spec = self.prepare(spec) if self.prepare else spec
+        job = Job(spec, priority=int(spec.get("priority") or 0))
+        with self.lock:
+            self.jobs[job.id] = job
+            self._trim()
+        self.pending.put((job.priority, next(self.order), job.id))
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self.lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id):
+        """Cancelar un job que todavia no empezo. Devuelve False si ya corrio"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return False
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            return True
+
+    def counts(self):
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+    def _trim(self):
+        finished = [j for j in self.jobs.values() if j.status in (DONE, FAILED, CANCELLED)]
+        excess = len(finished) - MAX_FINISHED_JOBS
+        if excess > 0:
+            for job in sorted(finished, key=lambda j: j.finished_at or 0)[:excess]:
+                del self.jobs[job.id]
+
+    def _worker(self):
+        while True:
+            _, _, job_id = self.pending.get()
+            if job_id is None:
+                return
+            job = self.get(job_id)
+            if job is None or job.status != QUEUED:
+                continue
+            job.status = RUNNING
+            job.started_at = time.time()
+            try:
+                job.summary = self.run_job(job)
+                job.status = DONE
+            except Exception as e:
+                job.error = str(e)[:500]
+                job.status = FAILED
+                print(f"Job {job.id} failed: {e}")
+            finally:
+                job.finished_at = time.time()
+
+    def start(self):
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        for _ in self.threads:
+            # None ordena despues de cualquier id: los jobs ya encolados terminan antes
+            self.pending.put((float("inf"), next(self.order), None))
+
+
+def make_job_server(job_queue, host, port, token=None, health=None, metrics_text=None):
+    """
+    API HTTP local de la cola de jobs:
+
+        POST   /jobs        {"links": [...], "format": "csv", ...} -> 202 con el job
+        GET    /jobs        lista de jobs (sin el detalle por URL)
+        GET    /jobs/<id>   estado, resumen y resultado por URL (archivos)
+        DELETE /jobs/<id>   cancelar un job encolado
+        GET    /health      estado del servicio (health() agrega datos propios)
+        GET    /metrics     metricas en formato Prometheus
+
+    Si se pasa token, todas las requests deben traer "Authorization: Bearer <token>".
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "ScraperService/1.0"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, body):
+            data = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def authorized(self):
+            if not token or self.headers.get("Authorization") == f"Bearer {token}":
+                return True
+            self.send_json(401, {"error": "unauthorized"})
+            return False
+
+        def job_id(self):
+            parts = self.path.split("?")[0].strip("/").split("/")
+            return parts[1] if len(parts) == 2 and parts[0] == "jobs" else None
+
+        def do_GET(self):
+            if not self.authorized():
+                return
+            path = self.path.split("?")[0].rstrip("/")
+            if path == "/health":
+                body = {"status": "ok", "jobs": job_queue.counts()}
+                if health:
+                    body.update(health())
+                return self.send_json(200, body)
+            if path == "/metrics" and metrics_text:
+                data = metrics_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            if path == "/jobs":
+                return self.send_json(200, [job.to_dict(with_entries=False) for job in job_queue.list()])
+            job = job_queue.get(self.job_id()) if self.job_id() else None
+            if job is None:
+                return self.send_json(404, {"error": "not found"})
+            self.send_json(200, job.to_dict())
+
+        def do_POST(self):
+            if not self.authorized():
+                return
+            if self.path.split("?")[0].rstrip("/") != "/jobs":
+                return self.send_json(404, {"error": "not found"})
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                spec = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(spec, dict):
+                    raise ValueError("the job must be a JSON object")
+                job = job_queue.submit(spec)
+            except ValueError as e:
+                return self.send_json(400, {"error": str(e)})
+            self.send_json(202, job.to_dict(with_entries=False))
+
+        def do_DELETE(self):
+            if not self.authorized():
+                return
+            job_id = self.job_id()
+            if not job_id or job_queue.get(job_id) is None:
+                return self.send_json(404, {"error": "not found"})
+            if not job_queue.cancel(job_id):
+                return self.send_json(409, {"error": "job already started"})
+            self.send_json(200, job_queue.get(job_id).to_dict(with_entries=False))
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# Metricas de la ejecucion: tiempo por etapa y contadores, globales y por post
+_lock = threading.Lock()
+_local = threading.local()
+_started_at = time.time()
+_stages = {}     # etapa -> {"seconds": float, "count": int}
+_counters = {}   # contador -> int
+_posts = {}      # post -> {"stages": {...}, "counters": {...}}
+_gauges = {}     # gauge -> {etiquetas Prometheus: valor}
+
+
+def _post_entry(post):
+    entry = _posts.get(post)
+    if entry is None:
+        entry = _posts[post] = {"stages": {}, "counters": {}}
+    return entry
+
+
+@contextmanager
+def post_context(post):
+    """Atribuir las metricas del bloque (en este hilo) a un post"""
+    previous = getattr(_local, "post", None)
+    _local.post = post
+    try:
+        yield
+    finally:
+        _local.post = previous
+
+
+def current_post():
+    return getattr(_local, "post", None)
+
+
+def record_stage(name, seconds, post=None):
+    post = post or current_post()
+    with _lock:
+        stage = _stages.setdefault(name, {"seconds": 0.0, "count": 0})
+        stage["seconds"] += seconds
+        stage["count"] += 1
+        if post:
+            stages = _post_entry(post)["stages"]
+            stages[name] = stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name, post=None):
+    """Medir la duracion de una etapa (login, media_info, comments, export...)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started, post)
+
+
+def incr(name, amount=1, post=None):
+    """Sumar a un contador (requests, retries, relogins, pages, comments...)"""
+    post = post or current_post()
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+        if post:
+            counters = _post_entry(post)["counters"]
+            counters[name] = counters.get(name, 0) + amount
+
+
+def set_gauge(name, value, **labels):
+    """Guardar el valor actual de un gauge (ej. ritmo de requests por cuenta)"""
+    key = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    with _lock:
+        _gauges.setdefault(name, {})[key] = value
+
+
+def snapshot():
+    """Copia de todas las metricas de la ejecucion"""
+    with _lock:
+        return {
+            "started_at": _started_at,
+            "elapsed_seconds": time.time() - _started_at,
+            "stages": {k: dict(v) for k, v in _stages.items()},
+            "counters": dict(_counters),
+            "gauges": {k: dict(v) for k, v in _gauges.items()},
+            "posts": {
+                post: {"stages": dict(v["stages"]), "counters": dict(v["counters"])}
+                for post, v in _posts.items()
+            },
+        }
+
+
+def _prometheus_text(data):
+    lines = [
+        "# HELP scraper_stage_seconds_total Time spent per pipeline stage",
+        "# TYPE scraper_stage_seconds_total counter",
+    ]
+    for name, stage_data in sorted(data["stages"].items()):
+        lines.append(f'scraper_stage_seconds_total{{stage="{name}"}} {stage_data["seconds"]:.6f}')
+    lines += [
+        "# HELP scraper_stage_runs_total Times each pipeline stage ran",
+        "# TYPE scraper_stage_runs_total counter",
+    ]
+    for name, stage_data in sorted(data["stages"].items()):
+        lines.append(f'scraper_stage_runs_total{{stage="{name}"}} {stage_data["count"]}')
+    lines += [
+        "# HELP scraper_events_total Requests, retries, re-logins, pages and comments",
+        "# TYPE scraper_events_total counter",
+    ]
+    for name, value in sorted(data["counters"].items()):
+        lines.append(f'scraper_events_total{{event="{name}"}} {value}')
+    for name, values in sorted(data.get("gauges", {}).items()):
+        lines.append(f"# TYPE scraper_{name} gauge")
+        for labels, value in sorted(values.items()):
+            lines.append(f"scraper_{name}{{{labels}}} {value}" if labels else f"scraper_{name} {value}")
+    lines += [
+        "# HELP scraper_run_seconds Wall time of the run",
+        "# TYPE scraper_run_seconds gauge",
+        f"scraper_run_seconds {data['elapsed_seconds']:.3f}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def prometheus_text():
+    """Metricas actuales en formato Prometheus (endpoint /metrics del modo servicio)"""
+    return _prometheus_text(snapshot())
+
+
+def write_run_report(outdir, name):
+    """
+    Guardar el reporte de la ejecucion como JSON y como texto Prometheus.
+
+    Returns:
+        tuple: (ruta del JSON, ruta del .prom)
+    """
+    os.makedirs(outdir, exist_ok=True)
+    data = snapshot()
+    json_path = os.path.join(outdir, name + ".json")
+    prom_path = os.path.join(outdir, name + ".prom")
+
+    with open(json_path, mode="w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    with open(prom_path, mode="w", encoding="utf-8") as f:
+        f.write(_prometheus_text(data))
+
+    return json_path, prom_path
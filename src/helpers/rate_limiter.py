@@ -0,0 +1,138 @@
+import os
+import time
+import threading
+from collections import deque
+from helpers import metrics
+from helpers.retry_policy import THROTTLED, CHALLENGE, classify_error
+
+# Requests por segundo de cada cuenta: inicial, minimo y maximo
+RATE_INITIAL = float(os.getenv("INSTAGRAM_RATE", "0.5"))
+RATE_MIN = float(os.getenv("INSTAGRAM_RATE_MIN", "0.1"))
+RATE_MAX = float(os.getenv("INSTAGRAM_RATE_MAX", "2.0"))
+# Requests que se pueden hacer seguidos si la cuenta estuvo ociosa
+RATE_BURST = float(os.getenv("INSTAGRAM_RATE_BURST", "3"))
+
+# Aumento aditivo tras INCREASE_AFTER exitos seguidos; ante un 429 el ritmo se divide por 2
+INCREASE_AFTER = 20
+INCREASE_STEP = 0.05
+DECREASE_FACTOR = 0.5
+# Ventana para calcular el ritmo real de requests
+WINDOW_SECONDS = 60.0
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket por cuenta con ritmo adaptativo (AIMD).
+
+    Cada request toma un token con acquire() (esperando si hace falta) y
+    despues informa el resultado: tras INCREASE_AFTER exitos seguidos el ritmo
+    sube INCREASE_STEP req/s, un throttle lo divide por 2 y un challenge lo
+    baja al minimo. Todos los hilos de la cuenta comparten el mismo bucket.
+
+    El bucket solo espacia los requests; no los hace de a uno. Eso lo hace
+    serialize_client_requests (scraper_instagram) con el lock de cada cliente.
+    """
+
+    def __init__(self, name, rate=None, min_rate=None, max_rate=None, burst=None):
+        self.name = name
+        self.min_rate = min_rate or RATE_MIN
+        self.max_rate = max(max_rate or RATE_MAX, self.min_rate)
+        self.rate = min(max(rate or RATE_INITIAL, self.min_rate), self.max_rate)
+        self.burst = max(burst or RATE_BURST, 1.0)
+        self.tokens = 1.0
+        self.updated_at = time.monotonic()
+        self.successes = 0
+        self.recent = deque()    # instantes de los requests de la ultima ventana
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Tomar un token, durmiendo lo necesario. Devuelve los segundos esperados"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            # El token se reserva ya (tokens puede quedar negativo): los hilos
+            # que llegan despues esperan su turno detras de este
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.recent.append(now + wait)
+        if wait > 0:
+            metrics.record_stage("rate_limit_wait", wait)
+            time.sleep(wait)
+        self._report()
+        return wait
+
+    def record_success(self):
+        with self.lock:
+            self.successes += 1
+            if self.successes < INCREASE_AFTER or self.rate >= self.max_rate:
+                return
+            self.successes = 0
+            self.rate = min(self.max_rate, self.rate + INCREASE_STEP)
+
+    def record_failure(self, kind):
+        """Bajar el ritmo ante throttling o challenge; otros errores no cambian nada"""
+        if kind not in (THROTTLED, CHALLENGE):
+            return
+        with self.lock:
+            self.successes = 0
+            previous = self.rate
+            self.rate = self.min_rate if kind == CHALLENGE else max(self.min_rate, self.rate * DECREASE_FACTOR)
+            # Sin rafaga despues de un throttle
+            self.tokens = min(self.tokens, 0.0)
+        metrics.incr("rate_decreases")
+        print(f"Rate limit for {self.name}: {kind} - {previous:.2f} -> {self.rate:.2f} req/s")
+        self._report()
+
+    def effective_rate(self):
+        """Requests por segundo realmente hechos en la ultima ventana"""
+        with self.lock:
+            now = time.monotonic()
+            while self.recent and self.recent[0] < now - WINDOW_SECONDS:
+                self.recent.popleft()
+            # N requests marcan N-1 intervalos entre el primero y el ultimo
+            if len(self.recent) < 2:
+                return 0.0
+            span = self.recent[-1] - self.recent[0]
+            return (len(self.recent) - 1) / span if span > 0 else 0.0
+
+    def _report(self):
+        metrics.set_gauge("account_rate_limit_rps", round(self.rate, 4), account=self.name)
+        metrics.set_gauge("account_request_rps", round(self.effective_rate(), 4), account=self.name)
+
+
+_LIMITERS = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_limiter(account):
+    """Rate limiter compartido de una cuenta"""
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(account)
+        if limiter is None:
+            limiter = _LIMITERS[account] = AdaptiveRateLimiter(account)
+        return limiter
+
+
+def limit_client_requests(cl, account):
+    """
+    Pasar todos los private_request del cliente por el rate limiter de la
+    cuenta (reemplaza el delay_range fijo de instagrapi). Se aplica despues de
+    serialize_client_requests, asi la espera del bucket no retiene el lock.
+    """
+    limiter = get_limiter(account)
+    private_request = cl.private_request
+
+    def limited_private_request(*args, **kwargs):
+        limiter.acquire()
+        try:
+            result = private_request(*args, **kwargs)
+        except Exception as e:
+            limiter.record_failure(classify_error(e))
+            raise
+        limiter.record_success()
+        return result
+
+    cl.private_request = limited_private_request
+    cl.delay_range = None
+    return cl
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from helpers import metrics
+
+# Cache local de respuestas (HTML de Scrapfly, payloads de la API privada)
+CACHE_DIR = os.path.join("scrape", "cache")
+CACHE_TTL_HOURS = float(os.getenv("CACHE_TTL_HOURS", "24"))
+CACHE_MAX_MB = float(os.getenv("CACHE_MAX_MB", "500"))
+
+# Modos de uso del cache
+NORMAL = "normal"          # usar el cache si esta vigente, si no ir a la red
+CACHE_ONLY = "cache_only"  # nunca ir a la red; un miss es un error
+REFRESH = "refresh"        # ignorar lo guardado, ir a la red y reescribir
+
+_mode = NORMAL
+_size_bytes = None
+_lock = threading.Lock()
+
+
+class CacheMiss(LookupError):
+    """No hay respuesta vigente en cache y el modo es cache-only"""
+
+
+def set_cache_mode(mode):
+    global _mode
+    _mode = mode
+
+
+def cache_mode():
+    return _mode
+
+
+def _path(kind, key):
+    # Direccionado por contenido: el nombre es el hash de (tipo, clave)
+    digest = hashlib.sha256(f"{kind}:{key}".encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, kind, digest[:2], digest + ".json")
+
+
+def _entries():
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            if name.endswith(".json"):
+                yield os.path.join(root, name)
+
+
+def _current_size():
+    global _size_bytes
+    if _size_bytes is None:
+        _size_bytes = sum(os.path.getsize(p) for p in _entries())
+    return _size_bytes
+
+
+def _evict(max_bytes):
+    """Borrar las entradas usadas hace mas tiempo hasta quedar bajo max_bytes"""
+    global _size_bytes
+    if _current_size() <= max_bytes:
+        return
+    by_age = sorted(_entries(), key=lambda p: os.stat(p).st_mtime)
+    for path in by_age:
+        if _size_bytes <= max_bytes:
+            break
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            _size_bytes -= size
+        except OSError:
+            pass
+
+
+def get(kind, key, ttl_hours=None):
+    """Valor guardado para (kind, key) si existe y no expiro; si no, None"""
+    if _mode == REFRESH:
+        return None
+
+    ttl_hours = CACHE_TTL_HOURS if ttl_hours is None else ttl_hours
+    path = _path(kind, key)
+    try:
+        with open(path, encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if time.time() - entry.get("stored_at", 0) > ttl_hours * 3600:
+        return None
+
+    # El mtime marca el ultimo uso para la eviccion LRU
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return entry.get("value")
+
+
+def put(kind, key, value):
+    """Guardar un valor JSON-serializable y aplicar el limite de tamano"""
+    global _size_bytes
+    path = _path(kind, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = json.dumps(
+        {"kind": kind, "key": str(key), "stored_at": time.time(), "value": value},
+        ensure_ascii=False,
+    )
+
+    with _lock:
+        current = _current_size()
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, mode="w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        _size_bytes = current - previous + os.path.getsize(path)
+        _evict(CACHE_MAX_MB * 1024 * 1024)
+
+
+def get_or_fetch(kind, key, fetch, ttl_hours=None):
+    """
+    Devolver el valor cacheado o llamar a fetch() y guardarlo.
+
+    En modo cache-only nunca llama a fetch(): un miss lanza CacheMiss.
+    """
+    value = get(kind, key, ttl_hours)
+    if value is not None:
+        metrics.incr("cache_hits")
+        return value
+    metrics.incr("cache_misses")
+    if _mode == CACHE_ONLY:
+        raise CacheMiss(f"No cached {kind} for {key}")
+
+    value = fetch()
+    put(kind, key, value)
+    return value
@@ -0,0 +1,202 @@
+import os
+import time
+import random
+import threading
+from helpers import metrics
+
+# Categorias de error
+LOGIN_REQUIRED = "login_required"
+UNAUTHORIZED = "unauthorized"      # HTTP 401/403
+THROTTLED = "throttled"            # HTTP 429 / "please wait a few minutes"
+CHALLENGE = "challenge"            # checkpoint / challenge / cuenta bloqueada
+VALIDATION = "validation"          # payload invalido (pydantic, datos vacios)
+TRANSIENT = "transient"            # red, timeouts, 5xx
+FATAL = "fatal"                    # cualquier otra cosa: no reintentar
+
+# Errores que vale la pena reintentar
+RETRYABLE = {LOGIN_REQUIRED, UNAUTHORIZED, THROTTLED, TRANSIENT}
+# Errores que dicen algo de la salud de la cuenta y cuentan para el circuit breaker
+# (un payload invalido o un "User not found" no)
+BREAKER_ERRORS = {LOGIN_REQUIRED, UNAUTHORIZED, THROTTLED, CHALLENGE, TRANSIENT}
+
+BACKOFF_BASE_SECONDS = float(os.getenv("RETRY_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX_SECONDS = float(os.getenv("RETRY_BACKOFF_MAX", "60"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("BREAKER_COOLDOWN_SECONDS", "300"))
+
+
+class CircuitOpenError(RuntimeError):
+    """La cuenta tiene el circuito abierto: no se hacen mas requests por ahora"""
+
+
+def _status_code(exc):
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) or getattr(exc, "code", None)
+
+
+def classify_error(exc):
+    """
+    Clasificar una excepcion de instagrapi/requests/pydantic en una categoria.
+
+    Se usa el nombre de las clases (para no depender de importar instagrapi),
+    el status HTTP y, como ultimo recurso, el texto del mensaje.
+    """
+    names = " ".join(cls.__name__.lower() for cls in type(exc).__mro__)
+    message = str(exc).lower()
+    status = _status_code(exc)
+
+    if "challenge" in names or "checkpoint" in message or "challenge_required" in message:
+        return CHALLENGE
+    if "feedbackrequired" in names or "feedback_required" in message:
+        return CHALLENGE
+    if "loginrequired" in names or "login_required" in message:
+        return LOGIN_REQUIRED
+    if status == 429 or "throttled" in names or "ratelimit" in names or "pleasewait" in names \
+            or "please wait a few minutes" in message:
+        return THROTTLED
+    if status in (401, 403) or "unauthorized" in names or "forbidden" in names:
+        return UNAUTHORIZED
+    if "validationerror" in names or "no media data" in message:
+        return VALIDATION
+    if (isinstance(status, int) and status >= 500) or "timeout" in names or "connection" in names \
+            or isinstance(exc, (ConnectionError, TimeoutError)):
+        return TRANSIENT
+    return FATAL
+
+
+def backoff_delay(attempt, base=None, cap=None):
+    """Backoff exponencial con jitter completo: uniforme en [0, min(cap, base*2^attempt)]"""
+    base = BACKOFF_BASE_SECONDS if base is None else base
+    cap = BACKOFF_MAX_SECONDS if cap is None else cap
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por cuenta.
+
+    Se abre tras BREAKER_FAILURE_THRESHOLD fallos seguidos o inmediatamente
+    ante un challenge, y rechaza requests durante el cooldown. Pasado el
+    cooldown deja pasar un solo intento (half-open) y sigue rechazando al
+    resto mientras ese intento no termine: si sale bien se cierra, si falla
+    se vuelve a abrir.
+    """
+
+    def __init__(self, name, threshold=None, cooldown=None):
+        self.name = name
+        self.threshold = threshold or BREAKER_FAILURE_THRESHOLD
+        self.cooldown = cooldown or BREAKER_COOLDOWN_SECONDS
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False     # hay un intento half-open en curso
+        self.lock = threading.Lock()
+
+    def check(self):
+        """Lanza CircuitOpenError si el circuito sigue abierto"""
+        with self.lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(
+                    f"Circuit open for account {self.name} ({remaining:.0f}s left) - skipping request"
+                )
+            if self.probing:
+                raise CircuitOpenError(
+                    f"Circuit half-open for account {self.name} - waiting for the probe request"
+                )
+            # Half-open: dejar pasar un intento
+            self.probing = True
+            self.failures = self.threshold - 1
+
+    def release(self):
+        """El intento half-open termino sin resultado que cuente (p.ej. validacion)"""
+        with self.lock:
+            self.probing = False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self, kind):
+        with self.lock:
+            probe_failed, self.probing = self.probing, False
+            self.failures += 1
+            if kind == CHALLENGE or self.failures >= self.threshold:
+                if self.opened_at is None or probe_failed:
+                    print(f"Circuit breaker opened for account {self.name} after {self.failures} failures ({kind})")
+                self.opened_at = time.monotonic()
+
+
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_breaker(account):
+    """Circuit breaker compartido de una cuenta"""
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(account)
+        if breaker is None:
+            breaker = _BREAKERS[account] = CircuitBreaker(account)
+        return breaker
+
+
+def call_with_policy(fn, account=None, relogin=None, max_attempts=4, label="request"):
+    """
+    Ejecutar fn() con la politica de reintentos unificada.
+
+    - login_required / 401 / 403: un solo re-login (si se pasa relogin) y reintento
+    - 429 y errores transitorios: backoff exponencial con jitter
+    - validacion, challenge y errores desconocidos: se relanzan sin reintentar
+    Los errores de BREAKER_ERRORS y los exitos alimentan el circuit breaker
+    de la cuenta; validacion y errores desconocidos no lo abren.
+    """
+    breaker = get_breaker(account) if account else None
+    relogged = False
+
+    for attempt in range(max_attempts):
+        if breaker:
+            try:
+                breaker.check()
+            except CircuitOpenError:
+                metrics.incr("circuit_open")
+                raise
+        try:
+            result = fn()
+        except CircuitOpenError:
+            if breaker:
+                breaker.release()
+            raise
+        except Exception as e:
+            kind = classify_error(e)
+            metrics.incr(f"errors_{kind}")
+            if breaker:
+                if kind in BREAKER_ERRORS:
+                    breaker.record_failure(kind)
+                else:
+                    breaker.release()
+
+            last_attempt = attempt == max_attempts - 1
+            if kind not in RETRYABLE or last_attempt:
+                raise
+
+            if kind in (LOGIN_REQUIRED, UNAUTHORIZED):
+                if relogged or relogin is None:
+                    raise
+                print(f"{label}: {kind} - re-login and retry")
+                metrics.incr("relogins")
+                relogin()
+                relogged = True
+                continue
+
+            metrics.incr("retries")
+            delay = backoff_delay(attempt)
+            print(f"{label}: {kind} ({str(e)[:80]}) - retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        if breaker:
+            breaker.record_success()
+        return result
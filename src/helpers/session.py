@@ -0,0 +1,78 @@
+import os
+import json
+import time
+
+# Directorio donde se guardan los settings de sesion de instagrapi
+SESSION_DIR = os.path.join("scrape", "instagram", "sessions")
+
+# Edad maxima de una sesion guardada antes de forzar un login nuevo
+SESSION_MAX_AGE_HOURS = float(os.getenv("INSTAGRAM_SESSION_MAX_AGE_HOURS", "72"))
+
+
+def session_path(username):
+    """Ruta del archivo de sesion para un usuario"""
+    safe_username = "".join(ch for ch in username if ch.isalnum() or ch in "._-")
+    return os.path.join(SESSION_DIR, f"{safe_username}.json")
+
+
+def load_session_settings(username, max_age_hours=None):
+    """
+    Cargar los settings de sesion guardados para un usuario.
+
+    Returns:
+        dict con los settings de instagrapi, o None si no existen,
+        estan corruptos o ya expiraron.
+    """
+    if max_age_hours is None:
+        max_age_hours = SESSION_MAX_AGE_HOURS
+
+    filepath = session_path(username)
+    if not os.path.exists(filepath):
+        return None
+
+    try:
+        with open(filepath, encoding="utf-8") as f:
+            stored = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Session file unreadable, ignoring it: {e}")
+        return None
+
+    saved_at = stored.get("saved_at", 0)
+    age_hours = (time.time() - saved_at) / 3600
+    if age_hours > max_age_hours:
+        print(f"Saved session is {age_hours:.1f}h old (max {max_age_hours:g}h) - discarding")
+        return None
+
+    settings = stored.get("settings")
+    if not isinstance(settings, dict) or not settings.get("authorization_data"):
+        return None
+
+    return settings
+
+
+def save_session_settings(username, settings):
+    """
+    Guardar los settings de sesion de instagrapi con su fecha de creacion.
+
+    El archivo tiene los tokens de la cuenta: se crea legible solo por el
+    usuario (0600).
+    """
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    filepath = session_path(username)
+    tmp_path = filepath + ".tmp"
+
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    # Un .tmp que ya existia conserva su modo anterior
+    os.chmod(tmp_path, 0o600)
+    with os.fdopen(fd, mode="w", encoding="utf-8") as f:
+        json.dump({"saved_at": time.time(), "settings": settings}, f)
+    os.replace(tmp_path, filepath)
+
+    return filepath
+
+
+def delete_session_settings(username):
+    """Borrar la sesion guardada (p.ej. cuando Instagram la rechaza)"""
+    filepath = session_path(username)
+    if os.path.exists(filepath):
+        os.remove(filepath)
@@ -0,0 +1,77 @@
+import os
+import time
+import sqlite3
+
+# Serie temporal del modo watch: likes y comentarios de cada post en cada consulta
+WATCH_DB = os.path.join("scrape", "instagram", "watch.sqlite")
+
+
+class WatchLog:
+    """
+    Muestras de like_count / comment_count por post, guardadas en SQLite.
+
+    Cada consulta del modo watch agrega una fila; las filas en las que se
+    bajaron los comentarios quedan marcadas con fetched=1, asi se sabe con
+    que comment_count se hizo la ultima descarga aunque el proceso se
+    reinicie.
+    """
+
+    def __init__(self, path=WATCH_DB):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS samples (
+                shortcode TEXT NOT NULL,
+                sampled_at REAL NOT NULL,
+                media_pk TEXT,
+                like_count INTEGER,
+                comment_count INTEGER,
+                fetched INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (shortcode, sampled_at)
+            );
+        """)
+        self.conn.commit()
+
+    def record(self, shortcode, media_pk, like_count, comment_count, fetched=False):
+        """Guardar una muestra; devuelve su instante (para mark_fetched)"""
+        sampled_at = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO samples (shortcode, sampled_at, media_pk, like_count, comment_count, fetched) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (shortcode, sampled_at, str(media_pk), like_count, comment_count, int(fetched)),
+            )
+        return sampled_at
+
+    def mark_fetched(self, shortcode, sampled_at):
+        """Marcar que con esta muestra se bajaron los comentarios nuevos"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE samples SET fetched = 1 WHERE shortcode = ? AND sampled_at = ?",
+                (shortcode, sampled_at),
+            )
+
+    def last_fetched_count(self, shortcode):
+        """comment_count de la ultima descarga del post, o None si nunca se bajo"""
+        found = self.conn.execute(
+            "SELECT comment_count FROM samples WHERE shortcode = ? AND fetched = 1 "
+            "ORDER BY sampled_at DESC LIMIT 1",
+            (shortcode,),
+        ).fetchone()
+        return found[0] if found else None
+
+    def iter_samples(self, shortcode=None):
+        """(shortcode, sampled_at, like_count, comment_count, fetched) en orden de tiempo"""
+        if shortcode:
+            cursor = self.conn.execute(
+                "SELECT shortcode, sampled_at, like_count, comment_count, fetched FROM samples "
+                "WHERE shortcode = ? ORDER BY sampled_at", (shortcode,))
+        else:
+            cursor = self.conn.execute(
+                "SELECT shortcode, sampled_at, like_count, comment_count, fetched FROM samples "
+                "ORDER BY sampled_at, shortcode")
+        yield from cursor
+
+    def close(self):
+        self.conn.close()
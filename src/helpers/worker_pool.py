@@ -0,0 +1,64 @@
+import threading
+from collections import deque
+
+
+def run_work_stealing(items, workers, task_fn, worker_setup=None):
+    """
+    Procesar items en paralelo con un hilo por worker y robo de trabajo.
+
+    Los items se reparten en round-robin en una cola por worker. Cada worker
+    consume su propia cola por el frente y, cuando se vacia, roba del final
+    de la cola mas larga. Si worker_setup(worker) devuelve False el worker
+    no arranca y su cola la terminan los demas.
+
+    Args:
+        items: Lista de items a procesar
+        workers: Lista de workers (p.ej. credenciales de cada cuenta)
+        task_fn: Funcion task_fn(worker, item) que devuelve el resultado
+        worker_setup: Funcion opcional worker_setup(worker) -> bool
+
+    Returns:
+        list: Resultados en el mismo orden que items (None si fallo)
+    """
+    results = [None] * len(items)
+    if not items or not workers:
+        return results
+
+    queues = [deque() for _ in workers]
+    for idx, item in enumerate(items):
+        queues[idx % len(workers)].append((idx, item))
+
+    lock = threading.Lock()
+
+    def next_task(own):
+        with lock:
+            if queues[own]:
+                return queues[own].popleft()
+            victim = max(range(len(queues)), key=lambda j: len(queues[j]))
+            if queues[victim]:
+                return queues[victim].pop()
+        return None
+
+    def run(own, worker):
+        if worker_setup is not None and not worker_setup(worker):
+            return
+        while True:
+            task = next_task(own)
+            if task is None:
+                return
+            idx, item = task
+            try:
+                results[idx] = task_fn(worker, item)
+            except Exception as e:
+                print(f"Worker {own + 1} failed on item {idx + 1}: {e}")
+
+    threads = [
+        threading.Thread(target=run, args=(own, worker), daemon=True)
+        for own, worker in enumerate(workers)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return results
@@ -2,11 +2,29 @@ import sys
 import os
 import json
 import re
+import time
+import threading
+import importlib.util
 from datetime import datetime
-from helpers.export_excel import export_to_excel
-from helpers.export_csv import export_to_csv
-from helpers.common import validate_links, format_date_for_filename, SCRAPFLY_KEY
-from scrapfly import ScrapflyClient, ScrapeConfig
+from helpers.export_excel import export_to_excel_streaming
+from helpers.export_csv import export_to_csv, export_to_csv_compressed
+from helpers.export_jsonl import export_to_jsonl
+from helpers.export_parquet import export_to_parquet
+from helpers.common import (
+    validate_links, format_date_for_filename, load_instagram_accounts, canonicalize_instagram_url,
+)
+from helpers import common
+from helpers.session import load_session_settings, save_session_settings, delete_session_settings
+from helpers.worker_pool import run_work_stealing
+from helpers.checkpoint import CheckpointStore, CheckpointComments
+from helpers.comment_record import CommentRecord, PROFILE_COLUMNS, renumber
+from helpers.dedupe_index import SeenCommentIndex
+from helpers.retry_policy import call_with_policy, classify_error, VALIDATION
+from helpers.rate_limiter import limit_client_requests
+from helpers import response_cache
+from helpers.fetch_tiers import FETCH_TIERS, TierStats
+from helpers import metrics
+from helpers.fake_backend import point_instagrapi_at, FakeScrapflyClient
 
 sys.path = list(dict.fromkeys(sys.path))
 
@@ -18,17 +36,32 @@ def clean_url(url):
         raise ValueError(f"URL invalida detectada: {url[:100]}")
     return url
 
-# Try to import instagrapi
-try:
-    from instagrapi import Client as InstagrapiClient
-    from instagrapi.extractors import extract_media_v1
-    INSTAGRAPI_AVAILABLE = True
-except ImportError:
-    INSTAGRAPI_AVAILABLE = False
+# instagrapi (and its pydantic models) and scrapfly are heavy to import:
+# only check that instagrapi is installed here and import both on first use
+INSTAGRAPI_AVAILABLE = importlib.util.find_spec("instagrapi") is not None
+if not INSTAGRAPI_AVAILABLE:
     print("Warning: instagrapi not installed. Install it with: pip install instagrapi")
     print("   Without it, you'll need Instagram credentials to scrape ALL comments.")
 
-client = ScrapflyClient(key=SCRAPFLY_KEY) if SCRAPFLY_KEY else None
+_scrapfly_client = None
+
+def get_scrapfly_client():
+    """Scrapfly client, created on first use (None without an API key)"""
+    global _scrapfly_client
+    if _scrapfly_client is None:
+        if common.FAKE_SERVICE_URL:
+            _scrapfly_client = FakeScrapflyClient(common.FAKE_SERVICE_URL)
+        elif common.SCRAPFLY_KEY:
+            from scrapfly import ScrapflyClient
+            _scrapfly_client = ScrapflyClient(key=common.SCRAPFLY_KEY)
+    return _scrapfly_client
+
+def use_fake_service(url):
+    """Send every Instagram and Scrapfly request to the local fake service"""
+    global _scrapfly_client
+    common.FAKE_SERVICE_URL = url
+    _scrapfly_client = None
+    print(f"Using fake service at {url}")
 
 def find_in_dict(obj, target_key):
     """Recursively search for a key in nested dict/list structure"""
@@ -46,20 +79,98 @@ def find_in_dict(obj, target_key):
                 return result
     return None
 
+def find_path_in_dict(obj, target_key, path=()):
+    """Like find_in_dict, but return the key/index path to target_key (or None)"""
+    if isinstance(obj, dict):
+        if target_key in obj:
+            return path + (target_key,)
+        for key, value in obj.items():
+            if isinstance(value, (dict, list)):
+                found = find_path_in_dict(value, target_key, path + (key,))
+                if found is not None:
+                    return found
+    elif isinstance(obj, list):
+        for idx, item in enumerate(obj):
+            if isinstance(item, (dict, list)):
+                found = find_path_in_dict(item, target_key, path + (idx,))
+                if found is not None:
+                    return found
+    return None
+
+def follow_path(obj, path):
+    """Follow a path returned by find_path_in_dict; None if it no longer matches"""
+    for step in path:
+        try:
+            obj = obj[step]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return obj
+
+MEDIA_INFO_KEY = 'xdt_api__v1__media__shortcode__web_info'
+_MEDIA_INFO_QUOTED = f'"{MEDIA_INFO_KEY}"'
+_json_decoder = json.JSONDecoder()
+
+# JSON path where the media key was found in the last page, tried first next time
+_last_media_info_path = None
+
+def _media_item(media_info):
+    if isinstance(media_info, dict) and media_info.get('items'):
+        return media_info['items'][0]
+    return None
+
 def extract_media_data_from_html(html):
-    """Extract Instagram media data from HTML"""
-    script_pattern = r'<script[^>]*>(.*?)</script>'
-    scripts = re.findall(script_pattern, html, re.DOTALL)
+    """
+    Extract Instagram media data from HTML
 
-    for script in scripts:
-        if 'xdt_api__v1__media__shortcode__web_info' in script and len(script) > 10000:
-            try:
-                data = json.loads(script)
-                media_info = find_in_dict(data, 'xdt_api__v1__media__shortcode__web_info')
-                if media_info and 'items' in media_info and media_info['items']:
-                    return media_info['items'][0]
-            except json.JSONDecodeError:
-                continue
+    Fast path: jump straight to the media key and decode only the object
+    that follows it. Fallback: parse just the script that contains the key
+    and look it up through the path remembered from the previous page.
+    """
+    global _last_media_info_path
+
+    pos = html.find(_MEDIA_INFO_QUOTED)
+    while pos != -1:
+        value_start = html.find(':', pos + len(_MEDIA_INFO_QUOTED)) + 1
+        while 0 < value_start < len(html) and html[value_start] in ' \t\r\n':
+            value_start += 1
+        try:
+            media_info, _ = _json_decoder.raw_decode(html, value_start)
+            item = _media_item(media_info)
+            if item:
+                return item
+        except ValueError:
+            pass
+        pos = html.find(_MEDIA_INFO_QUOTED, pos + 1)
+
+    # Key is escaped inside a JS string or the object is split: bound the
+    # enclosing <script> and parse only that one
+    pos = html.find(MEDIA_INFO_KEY)
+    while pos != -1:
+        script_open = html.rfind('<script', 0, pos)
+        body_start = html.find('>', script_open) + 1
+        body_end = html.find('</script>', pos)
+        if script_open == -1 or body_end == -1:
+            break
+
+        try:
+            data = json.loads(html[body_start:body_end])
+        except json.JSONDecodeError:
+            pos = html.find(MEDIA_INFO_KEY, body_end)
+            continue
+
+        media_info = None
+        if _last_media_info_path is not None:
+            media_info = follow_path(data, _last_media_info_path)
+        if media_info is None:
+            path = find_path_in_dict(data, MEDIA_INFO_KEY)
+            if path is not None:
+                _last_media_info_path = path
+                media_info = follow_path(data, path)
+
+        item = _media_item(media_info)
+        if item:
+            return item
+        pos = html.find(MEDIA_INFO_KEY, body_end)
 
     return None
 
@@ -77,88 +188,191 @@ LIST_FIELDS_THAT_MUST_BE_LISTS = {
     "clips_attribution_info",
 }
 
+# Where the LIST_FIELDS_THAT_MUST_BE_LISTS keys show up in a media/{id}/info/
+# item ("*" = every element of a list). Checked first; the full walk in
+# normalize_lists is only needed when a payload still fails validation.
+MEDIA_LIST_FIELD_PATHS = (
+    ("video_versions",),
+    ("carousel_media",),
+    ("usertags",),
+    ("usertags", "in"),
+    ("sponsor_tags",),
+    ("clips_attribution_info",),
+    ("image_versions2", "candidates"),
+    ("carousel_media", "*", "video_versions"),
+    ("carousel_media", "*", "usertags"),
+    ("carousel_media", "*", "usertags", "in"),
+    ("carousel_media", "*", "sponsor_tags"),
+    ("carousel_media", "*", "image_versions2", "candidates"),
+    ("clips_metadata", "clips_items"),
+    ("clips_metadata", "audio_filter_infos"),
+    ("clips_metadata", "original_sound_info", "audio_filter_infos"),
+    ("clips_metadata", "music_info", "music_consumption_info", "audio_filter_infos"),
+    ("clips_metadata", "additional_audio_info", "additional_audio_assets"),
+    ("clips_metadata", "additional_audio_info", "audio_reattribution_info", "additional_audio_assets"),
+)
+
+_LEAF = object()
+
+def compile_list_field_schema(paths):
+    """Turn a list of key paths into a nested lookup tree used by normalize_with_schema"""
+    root = {}
+    for path in paths:
+        node = root
+        for step in path:
+            node = node.setdefault(step, {})
+        node[_LEAF] = True
+    return root
+
+MEDIA_LIST_FIELD_SCHEMA = compile_list_field_schema(MEDIA_LIST_FIELD_PATHS)
+
+def normalize_with_schema(obj, schema=MEDIA_LIST_FIELD_SCHEMA):
+    """
+    Replace None -> [] only at the known list-field locations of the schema.
+
+    Visits just the branches named in the schema instead of the whole
+    payload. Mutates obj in-place and returns it.
+    """
+    for key, node in schema.items():
+        if key is _LEAF or key == "*" or key not in obj:
+            continue
+        value = obj[key]
+        if value is None and _LEAF in node:
+            obj[key] = value = []
+        if isinstance(value, dict):
+            normalize_with_schema(value, node)
+        elif isinstance(value, list) and "*" in node:
+            item_schema = node["*"]
+            for item in value:
+                if isinstance(item, dict):
+                    normalize_with_schema(item, item_schema)
+    return obj
+
 def normalize_lists(obj, list_fields):
     """
-    Recursively walk a dict/list structure and replace None -> [] only when the
+    Walk a dict/list structure and replace None -> [] only when the
     current dict key is present in list_fields.
 
     This mutates the passed object in-place and returns it for convenience.
+    Uses an explicit stack and never copies the dicts it visits.
     """
-    if isinstance(obj, dict):
-        for k, v in list(obj.items()):
-            # If value is None and the key is expected to be a list, replace it.
-            if v is None and k in list_fields:
-                obj[k] = []
-            # Always recurse into nested dicts/lists to normalize deeply nested structures
-            if isinstance(obj[k], (dict, list)):
-                normalize_lists(obj[k], list_fields)
-    elif isinstance(obj, list):
-        for item in obj:
-            if isinstance(item, (dict, list)):
-                normalize_lists(item, list_fields)
+    stack = [obj]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for k, v in node.items():
+                # If value is None and the key is expected to be a list, replace it.
+                # (Assigning an existing key is safe while iterating.)
+                if v is None:
+                    if k in list_fields:
+                        node[k] = []
+                elif isinstance(v, (dict, list)):
+                    stack.append(v)
+        else:
+            for item in node:
+                if isinstance(item, (dict, list)):
+                    stack.append(item)
     return obj
 
-def safe_media_info(cl, media_pk, username=None, password=None):
+def extract_media_normalized(raw_media):
     """
-    Robust media_info wrapper with better error handling:
-    - Try cl.media_info_v1() directly first
-    - On Pydantic error, fetch raw data, normalize, then extract
-    - On 401, attempt re-login and retry (in-memory only)
+    Normalize a raw media item and build the Media model from it.
+
+    Applies the schema fix-up first and only falls back to the full
+    normalize_lists walk if validation still fails.
     """
-    # Strategy 1: Try the standard V1 API call
+    normalize_with_schema(raw_media)
+
+    from instagrapi.extractors import extract_media_v1
+
     try:
-        return cl.media_info_v1(media_pk)
-    except Exception as v1_err:
-        print(f"V1 API failed: {str(v1_err)[:100]}")
-        
-        # Strategy 2: Fetch raw data, normalize it, then extract
+        return extract_media_v1(raw_media)
+    except Exception:
+        normalize_lists(raw_media, LIST_FIELDS_THAT_MUST_BE_LISTS)
+        return extract_media_v1(raw_media)
+
+def _relogin_callback(cl, username=None, password=None):
+    """Build the re-login step used by the retry policy (None without credentials)"""
+    uname = username or os.getenv("INSTAGRAM_USERNAME")
+    pwd = password or os.getenv("INSTAGRAM_PASSWORD")
+    if not (uname and pwd):
+        return None
+
+    def relogin():
+        cl.login(uname, pwd, relogin=True)
+        print("Re-login successful")
+        try:
+            save_session_settings(uname, cl.get_settings())
+        except OSError:
+            pass
+
+    return relogin
+
+
+# Likes and comment counts change quickly: media_info is only reused for a few
+# minutes (with --cache-only the general CACHE_TTL_HOURS applies)
+MEDIA_INFO_CACHE_TTL_HOURS = float(os.getenv("MEDIA_INFO_CACHE_TTL_HOURS", "0.25"))
+
+def fetch_media_info(cl, media_pk, username=None, password=None, use_cache=True):
+    """
+    Fetch media info through the unified retry policy.
+
+    The raw media/{id}/info/ payload is normalized before building the Media
+    model. Login errors trigger a single re-login, 429s and network errors
+    back off with jitter, and every outcome feeds the account's circuit
+    breaker. A payload that fails validation is refetched once, bypassing
+    the cache (the cached copy may be stale or truncated). The raw payload
+    goes through the local response cache for MEDIA_INFO_CACHE_TTL_HOURS;
+    with use_cache=False it is always refetched and the fresh copy replaces
+    the cached one.
+    """
+    account = username or getattr(cl, "username", None)
+    fetched = []
+
+    def fetch_raw():
+        fetched.append(True)
+        metrics.incr("requests")
+        result = cl.private_request(f"media/{media_pk}/info/")
+        if not result or not result.get("items"):
+            raise ValueError("No media data in API response")
+        return result["items"][0]
+
+    def attempt(cached):
+        if cached:
+            cache_only = response_cache.cache_mode() == response_cache.CACHE_ONLY
+            payload = response_cache.get_or_fetch(
+                "media_info", media_pk, fetch_raw,
+                ttl_hours=None if cache_only else MEDIA_INFO_CACHE_TTL_HOURS,
+            )
+            if not fetched:
+                print(f"media_info {media_pk}: likes and comment count from the local cache")
+        else:
+            payload = fetch_raw()
+            response_cache.put("media_info", media_pk, payload)
+        return extract_media_normalized(payload)
+
+    def run(cached):
+        return call_with_policy(
+            lambda: attempt(cached),
+            account=account,
+            relogin=_relogin_callback(cl, username, password),
+            label=f"media_info {media_pk}",
+        )
+
+    with metrics.stage("media_info"):
         try:
-            # Get the raw media data from Instagram's private API
-            media_id = str(media_pk)
-            result = cl.private_request(f"media/{media_id}/info/")
-            
-            if not result or "items" not in result or not result["items"]:
-                raise ValueError("No media data in API response")
-            
-            raw_media = result["items"][0]
-            
-            # Normalize all list fields to prevent Pydantic validation errors
-            normalize_lists(raw_media, LIST_FIELDS_THAT_MUST_BE_LISTS)
-            
-            # Extract using the public extractor function
-            return extract_media_v1(raw_media)
-            
-        except Exception as normalize_err:
-            print(f"Normalized extraction failed: {str(normalize_err)[:100]}")
-            
-            # Strategy 3: Check if it's a 401 and try re-login (in-memory)
-            status_code = getattr(getattr(normalize_err, "response", None), "status_code", None)
-            
-            if status_code == 401:
-                uname = username or os.getenv("INSTAGRAM_USERNAME")
-                pwd = password or os.getenv("INSTAGRAM_PASSWORD")
-                
-                if uname and pwd:
-                    try:
-                        print("Attempting re-login (in-memory)...")
-                        cl.login(uname, pwd)
-                        
-                        # Retry after login
-                        result = cl.private_request(f"media/{media_pk}/info/")
-                        if result and "items" in result and result["items"]:
-                            raw_media = result["items"][0]
-                            normalize_lists(raw_media, LIST_FIELDS_THAT_MUST_BE_LISTS)
-                            return extract_media_v1(raw_media)
-                        
-                    except Exception as login_err:
-                        print(f"Re-login attempt failed: {login_err}")
-            
-            # If all strategies fail, raise a comprehensive error
-            raise RuntimeError(
-                f"All media_info strategies failed.\n"
-                f"V1 error: {str(v1_err)[:200]}\n"
-                f"Normalize error: {str(normalize_err)[:200]}"
-            ) from normalize_err
+            return run(use_cache)
+        except Exception as e:
+            if classify_error(e) != VALIDATION or response_cache.cache_mode() == response_cache.CACHE_ONLY:
+                raise
+            print(f"media_info {media_pk}: invalid payload ({str(e)[:80]}) - refetching once")
+            metrics.incr("retries")
+            return run(False)
+
+
+def safe_media_info(cl, media_pk, username=None, password=None):
+    """Robust media_info wrapper (kept for compatibility, see fetch_media_info)"""
+    return fetch_media_info(cl, media_pk, username, password)
 
 
 def patch_client_media_info(cl, username=None, password=None):
@@ -166,139 +380,611 @@ def patch_client_media_info(cl, username=None, password=None):
     Patch the client's media_info_v1 method to use our safe version
     This prevents Pydantic validation errors throughout the entire client
     """
-    # Store the original method in a place where safe_media_info can access it
+    # Keep the original method around for callers that want it
     if not hasattr(cl, '_original_media_info_v1'):
         cl._original_media_info_v1 = cl.media_info_v1
-    
+
     def patched_media_info_v1(media_pk):
-        """Wrapper that uses safe_media_info with the original method"""
-        try:
-            return safe_media_info_patched(cl, media_pk, username, password)
-        except Exception as e:
-            # If our safe version fails, try the original as last resort
-            print(f"Patched version failed, trying original: {str(e)[:100]}")
-            return cl._original_media_info_v1(media_pk)
-    
+        """Wrapper that routes media_info_v1 through fetch_media_info"""
+        return fetch_media_info(cl, media_pk, username, password)
+
     # Replace the method
     cl.media_info_v1 = patched_media_info_v1
     return cl
 
 
 def safe_media_info_patched(cl, media_pk, username=None, password=None):
+    """Same as safe_media_info; kept for compatibility with older callers"""
+    return fetch_media_info(cl, media_pk, username, password)
+
+
+# Logged-in clients shared by every URL of the run, keyed by username
+_CLIENTS = {}
+# Password of every account whose login failed in this run: the remaining
+# URLs fail fast instead of hammering the login endpoint (and locking the account)
+_FAILED_LOGINS = {}
+# One login at a time per account, so concurrent URLs wait for the same client
+_LOGIN_LOCKS = {}
+_LOGIN_LOCKS_LOCK = threading.Lock()
+
+
+def _login_with_retry(cl, username, password):
+    """Fresh login with a single retry after a short delay"""
+    try:
+        print("Performing fresh login...")
+        cl.login(username, password)
+        print("Login successful!")
+        return True
+    except Exception as e:
+        print(f"Login failed: {e}")
+        # Try one more time after small delay
+        time.sleep(2)
+        try:
+            print("Retrying login...")
+            cl.login(username, password)
+            print("Login successful on retry!")
+            return True
+        except Exception as e2:
+            print(f"Login failed again: {e2}")
+            return False
+
+
+def serialize_client_requests(cl):
+    """
+    Make the client's private_request mutually exclusive.
+
+    instagrapi stores every response on the client (last_json) and returns
+    it, so two threads sharing one Client can read each other's response.
+    The reply and profile pools share the post's client: their requests take
+    turns here, while parsing and retry back-off still overlap.
+    """
+    lock = threading.Lock()
+    private_request = cl.private_request
+
+    def locked_private_request(*args, **kwargs):
+        with lock:
+            return private_request(*args, **kwargs)
+
+    cl.private_request = locked_private_request
+    return cl
+
+
+def get_instagrapi_client(username, password):
     """
-    Version of safe_media_info that uses the original (unpached) method
-    to avoid infinite recursion
+    Return a logged-in, patched instagrapi client for this account.
+
+    The client is created once per run and shared across every URL. Session
+    settings are persisted between runs; a saved session is validated with a
+    cheap request and only replaced by a fresh login when Instagram rejects it.
+    A failed login is remembered for the run: later calls with the same
+    password return None without trying again.
     """
-    # Use the original method if available, otherwise fall back to current
-    original_method = getattr(cl, '_original_media_info_v1', cl.media_info_v1)
-    
-    # Strategy 1: Try the original V1 API call
+    cl = _CLIENTS.get(username)
+    if cl is not None:
+        return cl
+
+    with _LOGIN_LOCKS_LOCK:
+        login_lock = _LOGIN_LOCKS.setdefault(username, threading.Lock())
+    with login_lock:
+        cl = _CLIENTS.get(username)
+        if cl is not None:
+            return cl
+        if username in _FAILED_LOGINS and _FAILED_LOGINS[username] == password:
+            print(f"Login for @{username} already failed in this run - skipping")
+            metrics.incr("logins_skipped")
+            return None
+        cl = _create_instagrapi_client(username, password)
+        if cl is None:
+            _FAILED_LOGINS[username] = password
+        else:
+            _FAILED_LOGINS.pop(username, None)
+            _CLIENTS[username] = cl
+        return cl
+
+
+def _create_instagrapi_client(username, password):
+    """Build, log in and patch a new client (see get_instagrapi_client)"""
+    from instagrapi import Client as InstagrapiClient
+
+    cl = InstagrapiClient()
+    # Restored sessions don't set them: the retry policy keys breakers on the
+    # username and the page walkers re-login with this account's own password
+    cl.username = username
+    cl.password = password
+    if common.FAKE_SERVICE_URL:
+        point_instagrapi_at(cl, common.FAKE_SERVICE_URL)
+    # One request at a time per client, paced by the account's rate limiter
+    serialize_client_requests(cl)
+    limit_client_requests(cl, username)
+
+    logged_in = False
+    with metrics.stage("login"):
+        settings = load_session_settings(username)
+        if settings:
+            try:
+                print("Reusing saved session...")
+                cl.set_settings(settings)
+                metrics.incr("requests")
+                cl.get_timeline_feed()
+                logged_in = True
+                metrics.incr("session_reused")
+                print("Saved session is valid")
+            except Exception as e:
+                print(f"Saved session rejected: {str(e)[:100]}")
+                delete_session_settings(username)
+                # Keep the device identity so the new login looks like the same phone
+                old_uuids = cl.get_settings().get("uuids")
+                cl.set_settings({})
+                if old_uuids:
+                    cl.set_uuids(old_uuids)
+
+        if not logged_in:
+            metrics.incr("logins")
+            logged_in = _login_with_retry(cl, username, password)
+
+    if not logged_in:
+        return None
+
     try:
-        return original_method(media_pk)
-    except Exception as v1_err:
-        error_str = str(v1_err)
-        print(f"V1 API failed: {error_str[:100]}")
-        
-        # Check if it's a login error - handle it immediately
-        if 'login_required' in error_str.lower() or 'loginrequired' in str(type(v1_err)).lower():
-            print("Login required error detected - attempting re-login (in-memory)...")
-            uname = username or os.getenv("INSTAGRAM_USERNAME")
-            pwd = password or os.getenv("INSTAGRAM_PASSWORD")
-            
-            if uname and pwd:
-                try:
-                    import time
-                    time.sleep(1)  # Small delay before re-login
-                    cl.login(uname, pwd)
-                    print("Re-login successful, retrying request...")
-                    
-                    # Retry with fresh session (in-memory)
-                    return original_method(media_pk)
-                    
-                except Exception as login_err:
-                    print(f"Re-login failed: {str(login_err)[:100]}")
-        
-        # Strategy 2: Fetch raw data, normalize it, then extract
+        save_session_settings(username, cl.get_settings())
+    except OSError as e:
+        print(f"Warning: could not save session: {e}")
+
+    # CRITICAL: Patch the client to use our safe media_info everywhere
+    cl = patch_client_media_info(cl, username, password)
+    print("Client patched with safe media_info")
+    return cl
+
+
+# Query params used by instagrapi for the comments endpoint
+COMMENTS_PAGE_PARAMS = {"can_support_threading": "true", "permalink_enabled": "false"}
+# Empty pages that still carry a cursor are followed; this many in a row
+# counts as a truncated crawl
+MAX_EMPTY_PAGES = int(os.getenv("MAX_EMPTY_PAGES", "5"))
+
+
+def iter_comment_pages(cl, media_pk, cursor=None, sort_order=None):
+    """
+    Walk the comments endpoint one page at a time.
+
+    Yields (raw_comments, next_cursor) per API page, where next_cursor is the
+    params dict ({"min_id": ...} or {"max_id": ...}) for the following page,
+    or None on the last page. Callers still collect the rows of the whole post
+    (export needs the full list), so this bounds the size of each request,
+    not the memory of the run.
+
+    An empty page with a cursor is not the end: the API returns those now
+    and then mid-thread. After MAX_EMPTY_PAGES of them in a row a
+    RuntimeError is raised, like any other page error.
+    """
+    relogin = _relogin_callback(cl, getattr(cl, "username", None), getattr(cl, "password", None))
+    empty_pages = 0
+    while True:
+        params = dict(COMMENTS_PAGE_PARAMS)
+        if sort_order:
+            params["sort_order"] = sort_order
+        if cursor:
+            params.update(cursor)
+
+        def fetch_page():
+            metrics.incr("requests")
+            return cl.private_request(f"media/{media_pk}/comments/", params=params)
+
+        started = time.perf_counter()
+        result = call_with_policy(
+            fetch_page,
+            account=getattr(cl, "username", None),
+            relogin=relogin,
+            label=f"comments page {media_pk}",
+        )
+        metrics.record_stage("comment_pages", time.perf_counter() - started)
+        metrics.incr("pages")
+        raw_comments = result.get("comments") or []
+
+        if result.get("has_more_headload_comments") and result.get("next_min_id"):
+            next_cursor = {"min_id": result["next_min_id"]}
+        elif result.get("has_more_comments") and result.get("next_max_id"):
+            next_cursor = {"max_id": result["next_max_id"]}
+        else:
+            next_cursor = None
+
+        yield raw_comments, next_cursor
+
+        if not next_cursor:
+            return
+        empty_pages = 0 if raw_comments else empty_pages + 1
+        if empty_pages >= MAX_EMPTY_PAGES:
+            metrics.incr("truncated_crawls")
+            raise RuntimeError(f"{empty_pages} empty comment pages in a row - crawl truncated")
+        cursor = next_cursor
+
+
+def comment_row_from_raw(raw, number, parent=None):
+    """
+    Convert a raw API comment into the row used by the exporters.
+
+    Returns a CommentRecord: it reads like the exporters' column dict, but
+    keeps only the raw fields and formats URLs and times at export time.
+    `parent` is the Comment Number of the comment a reply belongs to.
+    """
+    return CommentRecord.from_raw(raw, number, parent)
+
+
+# Reply threads fetched at the same time per post (all on the post's account)
+REPLY_CONCURRENCY = int(os.getenv("REPLY_CONCURRENCY", "3"))
+
+
+def iter_child_comment_pages(cl, media_pk, comment_pk):
+    """
+    Walk the child_comments endpoint of one comment ("view replies").
+
+    Yields the raw replies of each page; every page goes through the retry
+    policy of the account like the top-level comment pages, and empty pages
+    are followed up to MAX_EMPTY_PAGES in a row.
+    """
+    relogin = _relogin_callback(cl, getattr(cl, "username", None), getattr(cl, "password", None))
+    cursor = None
+    empty_pages = 0
+    while True:
+        params = dict(cursor or {})
+
+        def fetch_page():
+            metrics.incr("requests")
+            return cl.private_request(f"media/{media_pk}/comments/{comment_pk}/child_comments/", params=params)
+
+        result = call_with_policy(
+            fetch_page,
+            account=getattr(cl, "username", None),
+            relogin=relogin,
+            label=f"replies {comment_pk}",
+        )
+        metrics.incr("reply_pages")
+        children = result.get("child_comments") or []
+
+        if result.get("has_more_tail_child_comments") and result.get("next_max_child_cursor"):
+            cursor = {"max_id": result["next_max_child_cursor"]}
+        elif result.get("has_more_head_child_comments") and result.get("next_min_child_cursor"):
+            cursor = {"min_id": result["next_min_child_cursor"]}
+        else:
+            cursor = None
+
+        yield children
+
+        if not cursor:
+            return
+        empty_pages = 0 if children else empty_pages + 1
+        if empty_pages >= MAX_EMPTY_PAGES:
+            metrics.incr("truncated_crawls")
+            raise RuntimeError(f"{empty_pages} empty reply pages in a row - thread truncated")
+
+
+def fetch_reply_threads(cl, media_pk, comments, concurrency=None, seen_index=None, seen_parents=(),
+                        parents=None, known_pks=(), start_number=None):
+    """
+    Fetch the full reply thread of every top-level comment that has replies.
+
+    Threads are walked by a bounded pool (REPLY_CONCURRENCY) on the post's
+    own client, so they share its request lock, rate limiter and circuit
+    breaker: requests go out one at a time within the account's budget and
+    once the breaker opens no new threads are started. Replies already
+    present in `comments` (or in seen_index, when deduping across runs) are
+    skipped. Returns the new reply rows, numbered after the existing
+    comments and linked to their parent through its Comment Number.
+
+    seen_parents are comments dropped by the dedupe index: they are not
+    exported again, but their threads are still walked for new replies
+    (which get an empty Parent Comment Number). `parents` replaces the
+    comments whose threads are walked (incremental and streamed runs),
+    replies whose pk is in known_pks are skipped, and start_number (default
+    after the last of `comments`) numbers the first new reply.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from threading import Event
+    from helpers.retry_policy import CircuitOpenError
+
+    if parents is None:
+        parents = [c for c in comments
+                   if isinstance(c, CommentRecord) and not c.is_reply and c.child_count and c.pk]
+    parents = list(parents) + [c for c in seen_parents if c.pk]
+    if not parents:
+        return []
+
+    seen = {c.pk for c in comments if isinstance(c, CommentRecord) and c.pk}
+    seen.update(c.pk for c in parents)
+    seen.update(known_pks)
+    concurrency = max(1, concurrency or REPLY_CONCURRENCY)
+    total_expected = sum(p.child_count for p in parents)
+    print(f"Fetching reply threads: {len(parents)} comments with ~{total_expected} replies "
+          f"({concurrency} at a time)...")
+    stop = Event()
+
+    def fetch_thread(parent):
+        if stop.is_set():
+            return parent, None
+        children = []
+        try:
+            for page in iter_child_comment_pages(cl, media_pk, parent.pk):
+                children.extend(page)
+        except CircuitOpenError:
+            stop.set()
+            return parent, None
+        except Exception as e:
+            print(f"Replies of comment {parent.pk} stopped early: {str(e)[:100]}")
+            metrics.incr("reply_threads_failed")
+        return parent, children
+
+    replies = []
+    next_number = start_number or len(comments) + 1
+    with metrics.stage("replies"), ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # map() keeps the parents' order, so numbering is deterministic
+        for parent, children in pool.map(fetch_thread, parents):
+            if children is None:
+                metrics.incr("reply_threads_skipped")
+                continue
+            for raw in children:
+                pk = int(raw.get("pk") or 0)
+                if pk and pk in seen:
+                    continue
+                seen.add(pk)
+                if seen_index is not None and not seen_index.add(media_pk, pk):
+                    metrics.incr("duplicates_dropped")
+                    continue
+                row = comment_row_from_raw(raw, next_number, parent=parent.number)
+                row.is_reply = True
+                replies.append(row)
+                next_number += 1
+
+    if stop.is_set():
+        print("   Circuit breaker opened - remaining reply threads skipped")
+    metrics.incr("replies", len(replies))
+    print(f"Fetched {len(replies)} replies")
+    return replies
+
+
+# Commenter profiles fetched at the same time, and how long a cached profile is valid
+PROFILE_CONCURRENCY = int(os.getenv("PROFILE_CONCURRENCY", "3"))
+PROFILE_CACHE_TTL_HOURS = float(os.getenv("PROFILE_CACHE_TTL_HOURS", "168"))
+
+ACCOUNT_TYPES = {1: "personal", 2: "business", 3: "creator"}
+
+
+def fetch_user_profile(cl, user_pk):
+    """Follower count, verification and account type of one user (users/{pk}/info/)"""
+    def fetch():
+        metrics.incr("requests")
+        user = (cl.private_request(f"users/{user_pk}/info/") or {}).get("user") or {}
+        if not user:
+            raise ValueError("No user data in API response")
+        # Never cache another user's profile under this pk
+        if str(user.get("pk")) != str(user_pk):
+            raise ValueError(f"user_info returned user {user.get('pk')} instead of {user_pk}")
+        account_type = user.get("account_type")
+        return {
+            "follower_count": user.get("follower_count"),
+            "is_verified": bool(user.get("is_verified")),
+            "account_type": ACCOUNT_TYPES.get(account_type, "business" if user.get("is_business") else "personal"),
+        }
+
+    return call_with_policy(fetch, account=getattr(cl, "username", None), label=f"user_info {user_pk}")
+
+
+def enrich_commenter_profiles(cl, comments, concurrency=None):
+    """
+    Add follower count, verification and account type to every comment row.
+
+    Each unique commenter is looked up once: profiles come from the response
+    cache (kind "user_profile", PROFILE_CACHE_TTL_HOURS) and only the missing
+    ones are requested by a PROFILE_CONCURRENCY pool on the post's client,
+    whose requests are serialized (serialize_client_requests) so a response
+    can't be cached under another user. Once the circuit breaker opens the
+    remaining lookups are skipped; rows whose profile could not be fetched
+    get empty profile columns.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from threading import Event
+    from helpers.retry_policy import CircuitOpenError
+
+    rows = [c for c in comments if isinstance(c, CommentRecord)]
+    user_pks = list(dict.fromkeys(c.user_pk for c in rows if c.user_pk))
+    if not user_pks:
+        return 0
+
+    concurrency = max(1, concurrency or PROFILE_CONCURRENCY)
+    print(f"Enriching {len(user_pks)} commenter profiles ({concurrency} at a time)...")
+    stop = Event()
+
+    def lookup(user_pk):
+        if stop.is_set():
+            return user_pk, None
         try:
-            # Get the raw media data from Instagram's private API
-            media_id = str(media_pk)
-            result = cl.private_request(f"media/{media_id}/info/")
-            
-            if not result or "items" not in result or not result["items"]:
-                raise ValueError("No media data in API response")
-            
-            raw_media = result["items"][0]
-            
-            # Normalize all list fields to prevent Pydantic validation errors
-            normalize_lists(raw_media, LIST_FIELDS_THAT_MUST_BE_LISTS)
-            
-            # Extract using the public extractor function
-            return extract_media_v1(raw_media)
-            
-        except Exception as normalize_err:
-            error_str2 = str(normalize_err)
-            print(f"Normalized extraction failed: {error_str2[:100]}")
-            
-            # Check for login error again in normalized extraction
-            if 'login_required' in error_str2.lower() or 'loginrequired' in str(type(normalize_err)).lower():
-                print("Login required in normalized extraction - re-login attempt (in-memory)...")
-                uname = username or os.getenv("INSTAGRAM_USERNAME")
-                pwd = password or os.getenv("INSTAGRAM_PASSWORD")
-                
-                if uname and pwd:
-                    try:
-                        import time
-                        time.sleep(1)
-                        cl.login(uname, pwd)
-                        print("Re-login successful after normalization failure")
-                        
-                        # Final retry after re-login (in-memory)
-                        result = cl.private_request(f"media/{media_pk}/info/")
-                        if result and "items" in result and result["items"]:
-                            raw_media = result["items"][0]
-                            normalize_lists(raw_media, LIST_FIELDS_THAT_MUST_BE_LISTS)
-                            return extract_media_v1(raw_media)
-                        
-                    except Exception as final_login_err:
-                        print(f"Final re-login failed: {str(final_login_err)[:100]}")
-            
-            # Strategy 3: Check if it's a 401/403 and try re-login (legacy handler)
-            status_code = getattr(getattr(normalize_err, "response", None), "status_code", None)
-            
-            if status_code in [401, 403]:
-                uname = username or os.getenv("INSTAGRAM_USERNAME")
-                pwd = password or os.getenv("INSTAGRAM_PASSWORD")
-                
-                if uname and pwd:
-                    try:
-                        print("HTTP 401/403 detected - attempting re-login (in-memory)...")
-                        import time
-                        time.sleep(1)
-                        cl.login(uname, pwd)
-                        
-                        # Retry after login
-                        result = cl.private_request(f"media/{media_pk}/info/")
-                        if result and "items" in result and result["items"]:
-                            raw_media = result["items"][0]
-                            normalize_lists(raw_media, LIST_FIELDS_THAT_MUST_BE_LISTS)
-                            return extract_media_v1(raw_media)
-                        
-                    except Exception as login_err:
-                        print(f"Re-login attempt failed: {login_err}")
-            
-            # If all strategies fail, raise a comprehensive error
-            raise RuntimeError(
-                f"All media_info strategies failed.\n"
-                f"V1 error: {str(v1_err)[:200]}\n"
-                f"Normalize error: {str(normalize_err)[:200]}\n"
-                f"Hint: Try re-running with fresh credentials or check network/auth settings."
-            ) from normalize_err
-
-
-def scrape_with_instagrapi(url, username=None, password=None):
+            return user_pk, response_cache.get_or_fetch(
+                "user_profile", user_pk, lambda: fetch_user_profile(cl, user_pk),
+                ttl_hours=PROFILE_CACHE_TTL_HOURS,
+            )
+        except CircuitOpenError:
+            stop.set()
+        except response_cache.CacheMiss:
+            pass
+        except Exception as e:
+            print(f"Profile of user {user_pk} not available: {str(e)[:100]}")
+        metrics.incr("profiles_failed")
+        return user_pk, None
+
+    profiles = {}
+    with metrics.stage("profiles"), ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for user_pk, profile in pool.map(lookup, user_pks):
+            if profile:
+                # One tuple per user, shared by all of their comments
+                profiles[user_pk] = (profile.get("follower_count"), profile.get("is_verified"),
+                                     profile.get("account_type"))
+
+    for row in comments:
+        if isinstance(row, CommentRecord):
+            row.profile = profiles.get(row.user_pk, ())
+        else:
+            # Rows stored before user pks were kept: same columns, left empty
+            for column in PROFILE_COLUMNS:
+                row.setdefault(column, '')
+
+    if stop.is_set():
+        print("   Circuit breaker opened - remaining profiles skipped")
+    metrics.incr("profiles", len(profiles))
+    print(f"Enriched {len(profiles)}/{len(user_pks)} commenter profiles")
+    return len(profiles)
+
+
+def fetch_new_comments(cl, media_pk, store, mode, shortcode=None):
+    """
+    Incremental fetch: only comments newer than the last exported one.
+
+    Pages are requested newest first and pagination stops at the first page
+    that reaches an already exported comment. If the API ignores
+    sort_order (a page comes back oldest first) every page is scanned
+    instead and only the comments above the watermark are kept. Returns the
+    delta rows (mode='delta') or every exported row including the new ones
+    (mode='merged').
+
+    The new rows and the watermark are saved when the caller confirms the
+    export of `shortcode` (confirm_export), so a failed export gets the same
+    comments again on the next run.
+    """
+    watermark = store.get_watermark(media_pk)
+    newest_pk = watermark[0] if watermark else None
+    if newest_pk is None:
+        print("No previous export for this post - fetching everything once")
+    else:
+        print(f"Fetching comments newer than comment {newest_pk}...")
+
+    new_rows = []
+    complete = False
+    newest_first = None   # unknown until a page with two or more comments
+    try:
+        for raw_comments, next_cursor in iter_comment_pages(cl, media_pk, sort_order="newest"):
+            page_pks = [int(raw.get("pk") or 0) for raw in raw_comments]
+            if newest_first is None and len(page_pks) > 1:
+                newest_first = page_pks[0] > page_pks[-1]
+                if not newest_first:
+                    print("   Comments came back oldest first - scanning every page")
+            reached_seen = False
+            for comment_pk, raw in zip(page_pks, raw_comments):
+                if newest_pk is not None and comment_pk <= newest_pk:
+                    reached_seen = True
+                    continue
+                row = comment_row_from_raw(raw, len(new_rows) + 1)
+                new_rows.append((comment_pk, raw.get("created_at_utc"), row))
+            # Stopping early is only safe when the order is known to be newest first
+            if not next_cursor or (reached_seen and newest_first):
+                complete = True
+                break
+    except Exception as page_err:
+        print(f"Comment pagination stopped early: {str(page_err)[:100]}")
+
+    # Only advance the watermark when the run reached the already-seen
+    # comments (and the export succeeds), otherwise a gap would be hidden
+    if complete and shortcode:
+        def save_watermark():
+            exported_store = CheckpointStore()
+            try:
+                exported_store.save_exported(media_pk, new_rows)
+            finally:
+                exported_store.close()
+
+        defer_until_exported(shortcode, save_watermark)
+    elif not complete:
+        print("   Watermark not advanced - these comments will be fetched again next run")
+    print(f"{len(new_rows)} new comments since the last run")
+
+    # Number the delta oldest to newest
+    new_rows.sort(key=lambda r: r[0])
+    if mode == "merged":
+        return renumber(list(store.iter_exported(media_pk)) + [row for _, _, row in new_rows])
+    return renumber([row for _, _, row in new_rows])
+
+
+def fetch_incremental_replies(cl, media_pk, shortcode, comments, expected_new=None):
+    """
+    Reply stage of an incremental run.
+
+    The threads of the new top-level comments are always walked. Replies to
+    older comments don't show up in the newest-first delta: when expected_new
+    (how much the platform comment_count grew, from watch mode) is more than
+    what was found, every top-level page is scanned for exported comments
+    whose child_comment_count grew, and only those threads are walked.
+    The new replies and the updated reply counts are saved with the
+    watermark, once the caller confirms the export (confirm_export).
+    """
+    store = CheckpointStore()
+    try:
+        exported = {row.pk: row for row in store.iter_exported(media_pk)
+                    if isinstance(row, CommentRecord) and row.pk}
+    finally:
+        store.close()
+
+    new_parents = [c for c in comments if isinstance(c, CommentRecord) and c.pk not in exported
+                   and not c.is_reply and c.child_count and c.pk]
+    found = sum(1 for c in comments if isinstance(c, CommentRecord) and c.pk not in exported)
+    reply_rows = fetch_reply_threads(cl, media_pk, comments, parents=new_parents, known_pks=exported)
+    found += len(reply_rows)
+
+    grown = []
+    if expected_new and found < expected_new:
+        print(f"   {expected_new - found} new comments not in the delta - checking older reply threads")
+        number_of = {c.pk: c.number for c in comments if isinstance(c, CommentRecord) and c.pk}
+        try:
+            for raw_comments, _ in iter_comment_pages(cl, media_pk):
+                for raw in raw_comments:
+                    old = exported.get(int(raw.get("pk") or 0))
+                    if old is not None and not old.is_reply \
+                            and (raw.get("child_comment_count") or 0) > old.child_count:
+                        grown.append(CommentRecord.from_raw(raw, number_of.get(old.pk)))
+        except Exception as page_err:
+            print(f"   Scan of older comments stopped early: {str(page_err)[:100]}")
+        reply_rows += fetch_reply_threads(cl, media_pk, comments + reply_rows, parents=grown,
+                                          known_pks=exported)
+
+    if reply_rows or grown:
+        def save_replies():
+            # Replies are stored unlinked: Comment Numbers change between runs
+            rows = []
+            for row in reply_rows:
+                stored = CommentRecord(*row.to_state())
+                stored.parent = None
+                rows.append((row.pk, row.created_at, stored))
+            # The parents' new reply counts, so the next scan skips them
+            rows += [(parent.pk, parent.created_at, parent) for parent in grown]
+            exported_store = CheckpointStore()
+            try:
+                exported_store.save_exported(media_pk, rows)
+            finally:
+                exported_store.close()
+
+        defer_until_exported(shortcode, save_replies)
+    return reply_rows
+
+
+def scrape_with_instagrapi(url, username=None, password=None, resume=False, incremental=None,
+                           fetch_replies=True, dedupe=False, enrich_profiles=False, expected_new=None):
     """
     Scrape Instagram using instagrapi (requires login)
     This method gets ALL comments reliably
+
+    Every comment page is checkpointed; with resume=True a previously
+    interrupted crawl continues from its last saved cursor. With
+    incremental='delta' or 'merged' only comments newer than the previous
+    incremental run are fetched (see fetch_new_comments). Afterwards the
+    reply threads of comments with child_comment_count > 0 are fetched
+    (fetch_reply_threads, or fetch_incremental_replies with expected_new in
+    incremental runs) unless fetch_replies is False. With dedupe=True,
+    comments already exported by a previous run (SeenCommentIndex) are
+    dropped as they are parsed; the new pks are only saved to the index when
+    the caller confirms the export (confirm_export). With enrich_profiles=True every row gets its
+    commenter's followers, verification and account type
+    (enrich_commenter_profiles).
+
+    Outside incremental and enrich_profiles runs the comments are returned
+    as a CheckpointComments view: the exporter reads them back from the
+    checkpoint one row at a time, so only the comments with replies (and the
+    replies themselves) are held in memory.
     """
     if not INSTAGRAPI_AVAILABLE:
         print("Error: instagrapi not installed")
@@ -324,86 +1010,164 @@ def scrape_with_instagrapi(url, username=None, password=None):
     shortcode = shortcode_match.group(2)
     print(f"Shortcode: {shortcode}")
 
-    # Initialize client
-    cl = InstagrapiClient()
-    cl.delay_range = [1, 3]
-
-    # Login logic (no session persistence)
-    logged_in = False
-
     if not username or not password:
         print("Error: Username and password required")
         return None
 
-    # Always perform a fresh login in-memory (do not load or save session files)
-    try:
-        print("Performing fresh login (no session persistence)...")
-        cl.login(username, password)
-        logged_in = True
-        print("Login successful!")
-    except Exception as e:
-        print(f"Login failed: {e}")
-        # Try one more time after small delay
-        import time
-        time.sleep(2)
-        try:
-            print("Retrying login...")
-            cl.login(username, password)
-            logged_in = True
-            print("Login successful on retry!")
-        except Exception as e2:
-            print(f"Login failed again: {e2}")
+    cache_only = response_cache.cache_mode() == response_cache.CACHE_ONLY
+    if cache_only:
+        # Nothing may touch the network: media info comes from the response
+        # cache and comments from a completed checkpoint
+        from instagrapi import Client as InstagrapiClient
+        cl = InstagrapiClient()
+        resume = True
+    else:
+        # Reuse the shared, already patched session for this account
+        cl = get_instagrapi_client(username, password)
+        if cl is None:
+            print("Error: Could not establish valid session")
             return None
 
-    if not logged_in:
-        print("Error: Could not establish valid session")
-        return None
-
-    # CRITICAL: Patch the client to use our safe media_info everywhere
-    cl = patch_client_media_info(cl, username, password)
-    print("Client patched with safe media_info")
-
+    media_pk = None
     try:
         # Get media info
-        media_pk = cl.media_pk_from_code(shortcode)
+        with metrics.stage("media_pk"):
+            media_pk = cl.media_pk_from_code(shortcode)
         print(f"Media PK: {media_pk}")
         
-        media_info = safe_media_info_patched(cl, media_pk, username, password)
+        media_info = fetch_media_info(cl, media_pk, username, password)
 
         print(f"Post has {media_info.comment_count} comments (according to platform)")
 
-        # Fetch ALL comments with pagination
-        print("Fetching all comments...")
-        total_to_fetch = media_info.comment_count
-
-        # media_comments has an 'amount' parameter to specify how many to fetch
-        # By default it only fetches 20, so we need to specify the full amount
-        all_comments = cl.media_comments(media_pk, amount=total_to_fetch)
-
-        print(f"Fetched {len(all_comments)} comments!")
-
-        # Parse comments
-        comments = []
-        for i, comment_obj in enumerate(all_comments, 1):
-            # Safely get attributes that may not exist
-            is_reply = bool(getattr(comment_obj, 'parent_comment_id', None) or getattr(comment_obj, 'replied_to_comment_id', None))
-            
-            comment_dict = {
-                'Comment Number': i,
-                'User @': f'@{comment_obj.user.username}',
-                'User URL': f'https://instagram.com/{comment_obj.user.username}',
-                'Comment': comment_obj.text,
-                'Comment Likes': comment_obj.like_count,
-                'Comment Time': comment_obj.created_at_utc.strftime('%Y-%m-%d %H:%M:%S') if comment_obj.created_at_utc else '',
-                'Is 2nd Level Comment': is_reply
-            }
-            comments.append(comment_dict)
+        # Cross-run dedupe (incremental mode already skips exported comments)
+        seen_index = get_seen_index() if dedupe and not incremental else None
+        if seen_index is not None:
+            print(f"Dedupe index: {seen_index.known(media_pk)} comments of this post already exported")
+
+        # Top-level rows are streamed to the exporter from the checkpoint
+        # (CheckpointComments) instead of being kept in a list, except in
+        # incremental runs (the delta comes from the exported rows) and with
+        # enrich_profiles (which fills in every row before the export)
+        stream = not enrich_profiles and not (incremental and not cache_only)
+
+        # Fetch ALL comments with pagination, checkpointing every page
+        store = CheckpointStore()
+        try:
+            # replies counts 2nd level comments as rows are added (no extra passes)
+            comments, cursor, done, replies, duplicates = [], None, False, 0, 0
+            next_number = 1
+            # When streaming only what the reply stage needs stays in memory:
+            # the comments with replies, the pks of inline replies and the
+            # checkpoint rows that dedupe dropped on resume
+            kept, parents, inline_reply_pks, skipped_numbers = 0, [], set(), []
+            # Already exported comments with replies: new replies may hang from them
+            seen_parents = []
+
+            def keep(row):
+                nonlocal kept, replies
+                kept += 1
+                replies += bool(row['Is 2nd Level Comment'])
+                if not stream:
+                    comments.append(row)
+                elif isinstance(row, CommentRecord):
+                    if row.is_reply:
+                        inline_reply_pks.add(row.pk)
+                    elif row.child_count and row.pk:
+                        # Same number CheckpointComments will give it
+                        row.number = kept
+                        parents.append(row)
+
+            checkpoint = store.get(shortcode) if resume else None
+            if incremental and not cache_only:
+                for row in fetch_new_comments(cl, media_pk, store, incremental, shortcode):
+                    keep(row)
+                done = True
+            elif checkpoint:
+                for row in store.iter_rows(shortcode):
+                    if seen_index is not None and isinstance(row, CommentRecord) \
+                            and not seen_index.add(media_pk, row.pk):
+                        duplicates += 1
+                        skipped_numbers.append(row.number)
+                        if row.child_count and not row.is_reply:
+                            # Not in this export: its new replies get no Parent Comment Number
+                            row.number = None
+                            seen_parents.append(row)
+                        continue
+                    keep(row)
+                cursor, done = checkpoint['cursor'], checkpoint['done']
+                next_number = checkpoint['next_number']
+                print(f"Resuming from checkpoint: {kept} comments already fetched")
+            else:
+                store.reset(shortcode)
+
+            if not done and cache_only:
+                raise response_cache.CacheMiss(f"No complete comment checkpoint for {shortcode}")
+
+            if not done:
+                print("Fetching all comments (page by page)...")
+
+                # Rows are parsed as each page arrives; a failure on a later page
+                # keeps everything fetched so far and leaves a resumable cursor
+                try:
+                    for raw_comments, next_cursor in iter_comment_pages(cl, media_pk, cursor):
+                        with metrics.stage("parse"):
+                            page_rows = []
+                            for raw in raw_comments:
+                                if seen_index is not None and not seen_index.add(media_pk, raw.get("pk")):
+                                    duplicates += 1
+                                    if raw.get("child_comment_count"):
+                                        seen_parents.append(CommentRecord.from_raw(raw, None))
+                                    continue
+                                row = comment_row_from_raw(raw, next_number)
+                                next_number += 1
+                                page_rows.append(row)
+                        with metrics.stage("checkpoint"):
+                            store.save_page(shortcode, media_pk, page_rows, next_cursor)
+                        for row in page_rows:
+                            keep(row)
+                        metrics.incr("comments", len(page_rows))
+                except Exception as page_err:
+                    print(f"Comment pagination stopped early: {str(page_err)[:100]}")
+                    print(f"   Keeping the {kept} comments fetched before the error")
+                    print("   Run again with --resume to continue from this point")
+        finally:
+            store.close()
+
+        print(f"Fetched {kept} comments!")
+        if duplicates and not stream:
+            # Close the numbering gaps left by the dropped comments
+            renumber(comments)
+
+        # Replies hidden behind "view replies" come from their own endpoint
+        reply_rows = []
+        if fetch_replies and incremental and not cache_only:
+            reply_rows = fetch_incremental_replies(cl, media_pk, shortcode, comments, expected_new)
+        elif fetch_replies and not cache_only and stream:
+            reply_rows = fetch_reply_threads(cl, media_pk, [], seen_index=seen_index,
+                                             seen_parents=seen_parents, parents=parents,
+                                             known_pks=inline_reply_pks, start_number=kept + 1)
+        elif fetch_replies and not cache_only:
+            reply_rows = fetch_reply_threads(cl, media_pk, comments, seen_index=seen_index,
+                                             seen_parents=seen_parents)
+        replies += len(reply_rows)
+        if stream:
+            comments = CheckpointComments(shortcode, kept, skipped_numbers, reply_rows)
+        else:
+            comments.extend(reply_rows)
+
+        if enrich_profiles:
+            enrich_commenter_profiles(cl, comments)
+
+        if seen_index is not None:
+            # Saved once the caller has written the export (confirm_export)
+            defer_until_exported(shortcode, lambda: seen_index.commit(media_pk),
+                                 lambda: seen_index.discard(media_pk))
+            metrics.incr("duplicates_dropped", duplicates)
+            print(f"Dropped {duplicates} duplicate comments (already seen in this or a previous run)")
 
         # Prepare metadata
         user = media_info.user
         caption = media_info.caption_text or ''
-        lvl1 = [c for c in comments if not c['Is 2nd Level Comment']]
-        lvl2 = [c for c in comments if c['Is 2nd Level Comment']]
 
         metadata = {
             'Now': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
@@ -415,8 +1179,8 @@ def scrape_with_instagrapi(url, username=None, password=None):
             'Post Likes': media_info.like_count,
             'Post Shares': 0,
             'Description': caption,
-            'Number of 1st level comments': len(lvl1),
-            'Number of 2nd level comments': len(lvl2),
+            'Number of 1st level comments': len(comments) - replies,
+            'Number of 2nd level comments': replies,
             'Total Comments (actual)': len(comments),
             'Total Comments (platform says)': media_info.comment_count,
             'Difference': media_info.comment_count - len(comments)
@@ -428,18 +1192,180 @@ def scrape_with_instagrapi(url, username=None, password=None):
         print(f"Error: {e}")
         import traceback
         traceback.print_exc()
+        # Nothing will be exported: drop the watermark/dedupe updates queued so far
+        abandon_export(shortcode)
+        if dedupe and media_pk is not None:
+            get_seen_index().discard(media_pk)
         return None
 
-def scrape_with_scrapfly_only(url):
+# Index updates that may only be saved once the post's export is on disk,
+# keyed by shortcode: (commit, discard) pairs run by confirm_export/abandon_export
+_PENDING_EXPORTS = {}
+_PENDING_EXPORTS_LOCK = threading.Lock()
+
+def defer_until_exported(shortcode, commit, discard=None):
+    """Run commit() when the post is confirmed exported, discard() if the export fails"""
+    with _PENDING_EXPORTS_LOCK:
+        _PENDING_EXPORTS.setdefault(shortcode, []).append((commit, discard))
+
+def confirm_export(shortcode):
+    """The post's file is written: save its pending dedupe/watermark updates"""
+    with _PENDING_EXPORTS_LOCK:
+        pending = _PENDING_EXPORTS.pop(shortcode, [])
+    for commit, _ in pending:
+        commit()
+
+def abandon_export(shortcode):
+    """The post was not exported: drop its pending updates so the comments come back next run"""
+    with _PENDING_EXPORTS_LOCK:
+        pending = _PENDING_EXPORTS.pop(shortcode, [])
+    for _, discard in pending:
+        if discard:
+            discard()
+
+_seen_index = None
+_tier_stats = None
+# Batch workers can ask for them at the same time: only one instance is created
+_SHARED_STATE_LOCK = threading.Lock()
+
+def get_seen_index():
+    """Shared cross-run index of exported comment pks (opened on first use)"""
+    global _seen_index
+    with _SHARED_STATE_LOCK:
+        if _seen_index is None:
+            _seen_index = SeenCommentIndex()
+        return _seen_index
+
+def get_tier_stats():
+    """Shared per-run record of which Scrapfly tier works for each URL pattern"""
+    global _tier_stats
+    with _SHARED_STATE_LOCK:
+        if _tier_stats is None:
+            _tier_stats = TierStats()
+        return _tier_stats
+
+def _scrapfly_cost(result):
+    """Credits charged for a Scrapfly call (0 if the response doesn't say)"""
+    try:
+        return int(result.context['cost']['total'])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        pass
+    headers = getattr(result, 'headers', None) or {}
+    try:
+        return int(headers.get('X-Scrapfly-Api-Cost'))
+    except (AttributeError, TypeError, ValueError):
+        return 0
+
+def fetch_scrapfly_html_tiered(url):
+    """
+    Fetch post HTML trying the cheapest Scrapfly tier first.
+
+    Plain fetch -> ASP -> full JS rendering, escalating only when the
+    embedded media JSON can't be extracted. Starts at the tier that worked
+    last time for this URL pattern and records latency/credits per tier.
+    Returns (html, media_data) so the caller doesn't parse the page again.
+    """
+    client = get_scrapfly_client()
+    if isinstance(client, FakeScrapflyClient):
+        # The fake service takes plain dicts: the SDK isn't needed
+        make_config = dict
+    else:
+        from scrapfly import ScrapeConfig as make_config
+
+    stats = get_tier_stats()
+    pattern_match = re.search(r'/(p|reel|reels)/', url)
+    pattern = pattern_match.group(1) if pattern_match else 'other'
+
+    try:
+        for tier in FETCH_TIERS[stats.start_index(pattern):]:
+            options = {k: v for k, v in tier.items() if k != 'name'}
+            started = time.perf_counter()
+            metrics.incr("requests")
+            metrics.incr(f"scrapfly_{tier['name']}")
+            try:
+                with metrics.stage("scrapfly_fetch"):
+                    result = client.scrape(make_config(url=url, country='US', **options))
+            except Exception as e:
+                stats.record(tier['name'], time.perf_counter() - started, 0, False)
+                print(f"Scrapfly tier '{tier['name']}' failed: {str(e)[:100]}")
+                continue
+
+            html = result.content
+            with metrics.stage("extract_html"):
+                media_data = extract_media_data_from_html(html)
+            found = media_data is not None
+            stats.record(tier['name'], time.perf_counter() - started, _scrapfly_cost(result), found)
+            if found:
+                stats.record_winner(pattern, tier['name'])
+                return html, media_data
+            print(f"Scrapfly tier '{tier['name']}' had no media data - escalating")
+    finally:
+        try:
+            stats.save()
+        except OSError:
+            pass
+
+    raise RuntimeError("No Scrapfly tier returned the embedded media data")
+
+def fetch_scrapfly_html(url, shortcode):
+    """
+    Post HTML from Scrapfly (through the response cache and the tiered fetcher)
+    and its embedded media JSON, as (html, media_data).
+
+    The cache stores the HTML only: a fresh fetch reuses the tier's parse,
+    a cache hit parses the page once here.
+    """
+    fetched = {}
+
+    def fetch():
+        html, fetched['media_data'] = fetch_scrapfly_html_tiered(url)
+        return html
+
+    html = response_cache.get_or_fetch("scrapfly_html", shortcode, fetch)
+    if 'media_data' not in fetched:
+        with metrics.stage("extract_html"):
+            fetched['media_data'] = extract_media_data_from_html(html)
+    return html, fetched['media_data']
+
+def metadata_from_media_data(url, media_data):
+    """Build the metadata dict from the media JSON embedded in the page (no comments)"""
+    user = media_data.get('user', {})
+    owner = media_data.get('owner', user)
+    caption_data = media_data.get('caption', {})
+    caption = caption_data.get('text', '') if caption_data else ''
+
+    return {
+        'Now': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'Post URL': url,
+        'Publisher Nickname': owner.get('username', 'unknown'),
+        'Publisher @': f"@{owner.get('username', 'unknown')}",
+        'Publisher URL': f"https://instagram.com/{owner.get('username', '')}",
+        'Publish Time': datetime.fromtimestamp(media_data.get('taken_at', 0)).strftime('%Y-%m-%d %H:%M:%S'),
+        'Post Likes': media_data.get('like_count', 0),
+        'Post Shares': 0,
+        'Description': caption,
+        'Number of 1st level comments': 0,
+        'Number of 2nd level comments': 0,
+        'Total Comments (actual)': 0,
+        'Total Comments (platform says)': media_data.get('comment_count', 0),
+        'Difference': media_data.get('comment_count', 0)
+    }
+
+def scrape_with_scrapfly_only(url, raise_errors=False):
     """
     Scrape Instagram using only Scrapfly (no login required)
     WARNING: This method can only get metadata, NOT all comments
     Instagram requires authentication to access comments
+
+    With raise_errors=True failures are raised instead of returning None,
+    so batch callers can record the actual reason.
     """
-    if not client:
+    if not get_scrapfly_client() and response_cache.cache_mode() != response_cache.CACHE_ONLY:
         print("Error: Scrapfly client not available (no API key)")
+        if raise_errors:
+            raise RuntimeError("Scrapfly client not available (no API key)")
         return None
-        
+
     print(f"\nScraping with Scrapfly (no auth - limited data)...")
 
     # Limpiar URL
@@ -458,43 +1384,13 @@ def scrape_with_scrapfly_only(url):
     shortcode = shortcode_match.group(2)
 
     try:
-        result = client.scrape(ScrapeConfig(
-            url=url,
-            render_js=True,
-            rendering_wait=3000,
-            asp=True,
-            country='US',
-        ))
-
-        html = result.content
-        media_data = extract_media_data_from_html(html)
+        _, media_data = fetch_scrapfly_html(url, shortcode)
 
         if not media_data:
-            print("Error: Could not extract media data")
-            return None
+            raise ValueError("Could not extract media data")
 
         # Prepare metadata (NO COMMENTS - they require authentication)
-        user = media_data.get('user', {})
-        owner = media_data.get('owner', user)
-        caption_data = media_data.get('caption', {})
-        caption = caption_data.get('text', '') if caption_data else ''
-
-        metadata = {
-            'Now': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'Post URL': url,
-            'Publisher Nickname': owner.get('username', 'unknown'),
-            'Publisher @': f"@{owner.get('username', 'unknown')}",
-            'Publisher URL': f"https://instagram.com/{owner.get('username', '')}",
-            'Publish Time': datetime.fromtimestamp(media_data.get('taken_at', 0)).strftime('%Y-%m-%d %H:%M:%S'),
-            'Post Likes': media_data.get('like_count', 0),
-            'Post Shares': 0,
-            'Description': caption,
-            'Number of 1st level comments': 0,
-            'Number of 2nd level comments': 0,
-            'Total Comments (actual)': 0,
-            'Total Comments (platform says)': media_data.get('comment_count', 0),
-            'Difference': media_data.get('comment_count', 0)
-        }
+        metadata = metadata_from_media_data(url, media_data)
 
         total_comments = metadata["Total Comments (platform says)"]
         print(f"Got metadata only. {total_comments} comments NOT scraped (requires Instagram login)")
@@ -503,9 +1399,59 @@ def scrape_with_scrapfly_only(url):
 
     except Exception as e:
         print(f"Error: {e}")
+        if raise_errors:
+            raise
+        return None
+
+# Simultaneous Scrapfly requests allowed by our plan
+SCRAPFLY_CONCURRENCY = int(os.getenv("SCRAPFLY_CONCURRENCY", "5"))
+
+def scrape_batch_scrapfly_only(urls, concurrency=None, errors=None):
+    """
+    Metadata-only scrape of many URLs with concurrent Scrapfly requests.
+
+    Up to `concurrency` renders run at once; each page is parsed as soon as
+    it completes. Returns post_info dicts in the input order (None on failure);
+    if an `errors` dict is passed, the reason of each failure is stored in it
+    by input index.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    concurrency = max(1, concurrency or SCRAPFLY_CONCURRENCY)
+    print(f"\nScrapfly batch: {len(urls)} URLs, up to {concurrency} at a time")
+
+    results = [None] * len(urls)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        def scrape_one(url):
+            with metrics.post_context(url):
+                return scrape_with_scrapfly_only(url, raise_errors=True)
+
+        futures = {pool.submit(scrape_one, url): idx for idx, url in enumerate(urls)}
+        for done_count, future in enumerate(as_completed(futures), 1):
+            idx = futures[future]
+            try:
+                results[idx] = to_post_info(future.result())
+            except Exception as e:
+                print(f"Error on {urls[idx]}: {e}")
+                if errors is not None:
+                    errors[idx] = str(e)[:200]
+            print(f"[{done_count}/{len(urls)}] done: {urls[idx]}")
+
+    print(get_tier_stats().report())
+    return results
+
+def to_post_info(result):
+    """Combine a (metadata, comments) result into a single dict for easier handling"""
+    if not result:
         return None
 
-def scrape_instagram_video(url, instagram_username=None, instagram_password=None):
+    metadata, comments = result
+    return {
+        **metadata,
+        'comments': comments
+    }
+
+def scrape_instagram_video(url, instagram_username=None, instagram_password=None, **options):
     """
     Main scraping function with two modes:
     1. Authenticated (with Instagram credentials) - Gets ALL comments
@@ -519,28 +1465,522 @@ def scrape_instagram_video(url, instagram_username=None, instagram_password=None
     print(f"{'='*60}")
 
     # Check if we have Instagram credentials
-    if instagram_username and instagram_password:
-        print("Instagram credentials provided - will fetch ALL comments")
-        result = scrape_with_instagrapi(url, instagram_username, instagram_password)
-    else:
-        print("No Instagram credentials - can only get metadata (NO COMMENTS)")
-        print("   To get all comments, provide Instagram username & password")
-        result = scrape_with_scrapfly_only(url)
+    with metrics.post_context(url), metrics.stage("total"):
+        if instagram_username and instagram_password:
+            print("Instagram credentials provided - will fetch ALL comments")
+            result = scrape_with_instagrapi(url, instagram_username, instagram_password, **options)
+        else:
+            print("No Instagram credentials - can only get metadata (NO COMMENTS)")
+            print("   To get all comments, provide Instagram username & password")
+            result = scrape_with_scrapfly_only(url)
+        metrics.incr("posts_ok" if result else "posts_failed")
 
-    if not result:
-        return None
+    return to_post_info(result)
 
-    metadata, comments = result
+def scrape_batch_multi_account(links, accounts, **options):
+    """
+    Scrape a batch of links spreading the work over several Instagram accounts.
 
-    # Combine into single dict for easier handling
-    post_info = {
-        **metadata,
-        'comments': comments
-    }
+    Each account gets its own worker thread and logged-in client; idle workers
+    steal pending links from busier ones. Returns the same post_info dicts as
+    scrape_instagram_video, in the input order (None for failed links).
+    """
+    print(f"\nMulti-account mode: {len(links)} links across {len(accounts)} accounts")
+
+    def login_worker(account):
+        username, password = account
+        if get_instagrapi_client(username, password) is None:
+            print(f"Account @{username} could not log in - its links go to the other workers")
+            return False
+        return True
+
+    def scrape_link(account, link):
+        username, password = account
+        return scrape_instagram_video(link, username, password, **options)
+
+    return run_work_stealing(links, accounts, scrape_link, worker_setup=login_worker)
+
+# Output format -> exporter(metadata, comments, platform, filename, outdir)
+EXPORTERS = {
+    "csv": export_to_csv,
+    "xlsx": export_to_excel_streaming,
+    "parquet": export_to_parquet,
+    "jsonl": export_to_jsonl,
+    "csv.gz": lambda m, c, p, f, o=None: export_to_csv_compressed(m, c, p, f, compression="gzip", outdir=o),
+    "csv.zst": lambda m, c, p, f, o=None: export_to_csv_compressed(m, c, p, f, compression="zstd", outdir=o),
+}
+
+def export_post(metadata, comments, export_format, filename, outdir=None):
+    """Export one post's metadata and comments in the requested format"""
+    exporter = EXPORTERS.get(export_format, export_to_csv)
+    return exporter(metadata, comments, "instagram", filename, outdir)
+
+def profile_single_url(url, instagram_username=None, instagram_password=None):
+    """Scrape one URL under cProfile, dump the stats and print the top entries"""
+    import cProfile
+    import pstats
 
-    return post_info
+    outdir = os.path.join("scrape", "instagram")
+    os.makedirs(outdir, exist_ok=True)
+    shortcode_match = re.search(r'/(p|reel|reels)/([A-Za-z0-9_-]+)', url)
+    name = shortcode_match.group(2) if shortcode_match else "url"
+    profile_path = os.path.join(outdir, f"profile_{name}.prof")
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        scrape_instagram_video(url, instagram_username, instagram_password)
+    finally:
+        profiler.disable()
+        profiler.dump_stats(profile_path)
+
+    pstats.Stats(profile_path).sort_stats("cumulative").print_stats(25)
+    print(f"Profile guardado en {profile_path}")
+    report_paths = metrics.write_run_report(outdir, f"profile_{name}_report")
+    print(f"Reporte de ejecucion: {report_paths[0]}")
+
+def iter_batch_links(args):
+    """Raw links from --links and from --input (a file, or stdin with '-'), one per line"""
+    for link in args.links or []:
+        yield link
+    if not args.input:
+        return
+    f = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def iter_batch_results(targets, accounts, chunk_size, **options):
+    """
+    Yield (shortcode, url, post_info, error) for every target as it finishes.
+
+    Single-account runs go URL by URL; batch modes (concurrent Scrapfly,
+    multi-account pool) run chunk_size URLs at a time so results are
+    exported without holding the whole run in memory.
+    """
+    if len(accounts) == 1:
+        username, password = accounts[0]
+        for shortcode, url in targets:
+            try:
+                yield shortcode, url, scrape_instagram_video(url, username, password, **options), None
+            except Exception as e:
+                print(f"Error on {url}: {e}")
+                yield shortcode, url, None, str(e)[:200]
+        return
+
+    for start in range(0, len(targets), chunk_size):
+        chunk = targets[start:start + chunk_size]
+        urls = [url for _, url in chunk]
+        errors = {}
+        if accounts:
+            results = scrape_batch_multi_account(urls, accounts, **options)
+        else:
+            results = scrape_batch_scrapfly_only(urls, errors=errors)
+        for idx, ((shortcode, url), post) in enumerate(zip(chunk, results)):
+            yield shortcode, url, post, errors.get(idx)
+
+def run_batch(args):
+    """
+    Non-interactive batch run: links from --links/--input, credentials from
+    the environment (INSTAGRAM_USERNAME/INSTAGRAM_PASSWORD/INSTAGRAM_ACCOUNTS)
+    or --secrets-file. Each post is exported as soon as it is scraped and
+    recorded in a JSONL manifest (ok / failed / invalid / duplicate).
+
+    Returns:
+        int: exit status (1 if no post could be scraped)
+    """
+    global _scrapfly_client
+    if args.secrets_file:
+        common.load_secrets_file(args.secrets_file)
+        # The key may have changed: build the client again on first use
+        _scrapfly_client = None
+
+    username = os.getenv("INSTAGRAM_USERNAME")
+    password = os.getenv("INSTAGRAM_PASSWORD")
+    accounts = load_instagram_accounts(username, password)
+    if accounts and not INSTAGRAPI_AVAILABLE:
+        print("Error: instagrapi not installed. Install it with: pip install instagrapi")
+        return 1
+
+    options = {'resume': args.resume, 'incremental': args.incremental,
+               'fetch_replies': not args.no_replies, 'dedupe': args.dedupe,
+               'enrich_profiles': args.enrich_profiles}
+    summary = run_links(iter_batch_links(args), args.format, args.outdir, accounts,
+                        options, args.chunk_size)
+
+    print(f"\nBatch finished: {summary['ok']} ok, {summary['failed']} failed, {summary['skipped']} skipped")
+    print(f"Manifest: {summary['manifest']}")
+    report_paths = metrics.write_run_report(args.outdir, f"run_report_{summary['run_id']}")
+    print(f"Reporte de ejecucion: {report_paths[0]} / {report_paths[1]}")
+    return 0 if summary['ok'] or not summary['total'] else 1
+
+def run_links(raw_links, export_format, outdir, accounts, options, chunk_size=50,
+              run_id=None, on_entry=None):
+    """
+    Scrape and export a list of raw links (batch mode and service jobs).
+    Every result is written to manifest_{run_id}.jsonl and passed to on_entry.
+
+    Returns:
+        dict: run_id, manifest, total, ok, failed, skipped
+    """
+    os.makedirs(outdir, exist_ok=True)
+    run_id = run_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+    date_str = format_date_for_filename()
+    manifest_path = os.path.join(outdir, f"manifest_{run_id}.jsonl")
+
+    with open(manifest_path, mode="w", encoding="utf-8") as manifest:
+        def record(entry):
+            entry["at"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            manifest.flush()
+            if on_entry:
+                on_entry(entry)
+
+        # Canonicalize and dedupe up front so the progress total is exact
+        targets = []
+        seen = set()
+        skipped = 0
+        for raw in raw_links:
+            canonical = canonicalize_instagram_url(raw)
+            if canonical is None:
+                record({"input": raw, "status": "invalid"})
+                skipped += 1
+            elif canonical[0] in seen:
+                record({"input": raw, "shortcode": canonical[0], "status": "duplicate"})
+                skipped += 1
+            else:
+                seen.add(canonical[0])
+                targets.append(canonical)
+        seen = None
+
+        total = len(targets)
+        mode = "metadata only" if not accounts else f"{len(accounts)} account(s)"
+        print(f"Batch: {total} unique posts ({skipped} invalid/duplicate skipped), {mode}, "
+              f"format {export_format}, output {outdir}")
+
+        ok = failed = 0
+        started = time.monotonic()
+        for done, (shortcode, url, post, error) in enumerate(
+                iter_batch_results(targets, accounts, chunk_size, **options), 1):
+            entry = {"url": url, "shortcode": shortcode}
+            if post:
+                comments = post.pop('comments', [])
+                try:
+                    with metrics.post_context(url), metrics.stage("export"):
+                        path = export_post(post, comments, export_format,
+                                           f"instagram_{shortcode}_{date_str}", outdir)
+                    confirm_export(shortcode)
+                    entry.update(status="ok", file=path, comments=len(comments))
+                    ok += 1
+                except Exception as e:
+                    abandon_export(shortcode)
+                    entry.update(status="failed", error=f"export: {e}")
+                    failed += 1
+            else:
+                # Whatever the scrape queued for this post must not run with a later job
+                abandon_export(shortcode)
+                entry.update(status="failed", error=error or "no data")
+                failed += 1
+            record(entry)
+
+            # Coarse clocks (Windows) can report no time at all for an instant failure
+            elapsed = max(time.monotonic() - started, 1e-9)
+            eta = (total - done) * elapsed / done
+            print(f"[{done}/{total}] {entry['status']:<6} {shortcode}  "
+                  f"ok={ok} failed={failed}  {done / elapsed:.2f} posts/s  ETA {eta / 60:.1f} min",
+                  file=sys.stderr, flush=True)
+
+    return {"run_id": run_id, "manifest": manifest_path, "total": total,
+            "ok": ok, "failed": failed, "skipped": skipped}
+
+def serve(args):
+    """
+    Long-running service mode: log the accounts in once at startup, keep the
+    clients (and the Scrapfly client) warm, and run the scrape jobs posted to
+    a local HTTP API one after another (helpers/job_queue.py).
+
+    Each job is exported to <outdir>/jobs/<job id>/ with its own manifest.
+    """
+    from helpers.job_queue import JobQueue, make_job_server
+
+    global _scrapfly_client
+    if args.secrets_file:
+        common.load_secrets_file(args.secrets_file)
+        _scrapfly_client = None
+
+    accounts = load_instagram_accounts(os.getenv("INSTAGRAM_USERNAME"), os.getenv("INSTAGRAM_PASSWORD"))
+    if accounts and not INSTAGRAPI_AVAILABLE:
+        print("Error: instagrapi not installed. Install it with: pip install instagrapi")
+        return 1
+
+    host, _, port = args.serve.rpartition(":")
+    host = host or "127.0.0.1"
+    try:
+        port = int(port)
+    except ValueError:
+        print(f"Error: invalid --serve address '{args.serve}' (expected [HOST:]PORT)")
+        return 1
+
+    # Warm up: the login and the session check are paid once, not per job
+    for username, password in accounts:
+        if get_instagrapi_client(username, password) is None:
+            print(f"Warning: login failed for {username}; its jobs will retry the login")
+    get_scrapfly_client()
+
+    jobs_dir = os.path.join(args.outdir, "jobs")
+    started_at = time.time()
+
+    def prepare(spec):
+        links = spec.get("links")
+        if not isinstance(links, list) or not links or not all(isinstance(l, str) for l in links):
+            raise ValueError("'links' must be a non-empty list of URLs")
+        export_format = spec.get("format") or args.format
+        if export_format not in EXPORTERS:
+            raise ValueError(f"unsupported format '{export_format}' (use one of {', '.join(EXPORTERS)})")
+        if spec.get("incremental") not in (None, "delta", "merged"):
+            raise ValueError("'incremental' must be 'delta' or 'merged'")
+        try:
+            priority = int(spec.get("priority") or 0)
+        except (TypeError, ValueError):
+            raise ValueError("'priority' must be an integer")
+        options = {'resume': bool(spec.get("resume", args.resume)),
+                   'incremental': spec.get("incremental", args.incremental),
+                   'fetch_replies': bool(spec.get("fetch_replies", not args.no_replies)),
+                   'dedupe': bool(spec.get("dedupe", args.dedupe)),
+                   'enrich_profiles': bool(spec.get("enrich_profiles", args.enrich_profiles))}
+        return {"links": links, "format": export_format, "options": options, "priority": priority}
+
+    def run_job(job):
+        spec = job.spec
+        print(f"Job {job.id}: {len(spec['links'])} link(s), format {spec['format']}")
+        return run_links(spec["links"], spec["format"], os.path.join(jobs_dir, job.id), accounts,
+                         spec["options"], args.chunk_size, run_id=job.id, on_entry=job.entries.append)
+
+    def health():
+        return {
+            "uptime_seconds": round(time.time() - started_at, 1),
+            "accounts": len(accounts),
+            "accounts_logged_in": sum(1 for username, _ in accounts if username in _CLIENTS),
+            "scrapfly": _scrapfly_client is not None,
+        }
+
+    job_queue = JobQueue(run_job, prepare=prepare)
+    token = os.getenv("SCRAPER_SERVICE_TOKEN") or None
+    server = make_job_server(job_queue, host, port, token=token, health=health,
+                             metrics_text=metrics.prometheus_text)
+    job_queue.start()
+    print(f"Service listening on http://{host}:{port} ({len(accounts)} account(s), "
+          f"output {jobs_dir}{', token required' if token else ''})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping service...")
+    finally:
+        server.server_close()
+        job_queue.stop()
+        report_paths = metrics.write_run_report(jobs_dir, f"service_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        print(f"Reporte de ejecucion: {report_paths[0]}")
+    return 0
+
+WATCH_SERIES_COLUMNS = ['Checked At', 'Shortcode', 'Post Likes', 'Post Comments', 'Status']
+
+def run_watch(args):
+    """
+    Watch mode: poll the media info (likes, comment count) of every post each
+    --interval minutes and fetch comments only for posts whose comment_count
+    changed since their last fetch, incrementally (--incremental, delta by
+    default), so only the new comments are requested. New replies are found
+    through fetch_incremental_replies, and a post whose fetch or export
+    fails keeps its watermark and is fetched again on the next cycle.
+
+    Every poll is recorded in WatchLog (state survives restarts) and appended
+    to <outdir>/watch_series.csv.
+    """
+    import csv
+    from helpers.watch_log import WatchLog
+
+    global _scrapfly_client
+    if args.secrets_file:
+        common.load_secrets_file(args.secrets_file)
+        _scrapfly_client = None
+
+    accounts = load_instagram_accounts(os.getenv("INSTAGRAM_USERNAME"), os.getenv("INSTAGRAM_PASSWORD"))
+    if not accounts:
+        print("Error: watch mode needs Instagram credentials (INSTAGRAM_USERNAME/INSTAGRAM_PASSWORD)")
+        return 1
+    if not INSTAGRAPI_AVAILABLE:
+        print("Error: instagrapi not installed. Install it with: pip install instagrapi")
+        return 1
+
+    targets = {}
+    for raw in iter_batch_links(args):
+        canonical = canonicalize_instagram_url(raw)
+        if canonical is None:
+            print(f"Skipping invalid link: {raw}")
+        else:
+            targets.setdefault(canonical[0], canonical[1])
+    if not targets:
+        print("Error: no valid links to watch")
+        return 1
+
+    os.makedirs(args.outdir, exist_ok=True)
+    options = {'incremental': args.incremental or "delta", 'dedupe': args.dedupe,
+               'fetch_replies': not args.no_replies, 'enrich_profiles': args.enrich_profiles}
+    series_path = os.path.join(args.outdir, "watch_series.csv")
+    write_header = not os.path.exists(series_path)
+    log = WatchLog()
+    print(f"Watching {len(targets)} posts every {args.interval:g} min with {len(accounts)} account(s), "
+          f"comments fetched {options['incremental']} when the count changes")
+
+    cycle = 0
+    try:
+        with open(series_path, mode="a", newline="", encoding="utf-8") as series:
+            writer = csv.writer(series)
+            if write_header:
+                writer.writerow(WATCH_SERIES_COLUMNS)
+
+            while True:
+                cycle += 1
+                started = time.monotonic()
+                changed = fetched = 0
+                for index, (shortcode, url) in enumerate(targets.items()):
+                    username, password = accounts[index % len(accounts)]
+                    cl = get_instagrapi_client(username, password)
+                    if cl is None:
+                        print(f"[watch] {shortcode}: no session for {username}")
+                        continue
+
+                    with metrics.post_context(url):
+                        try:
+                            media_pk = cl.media_pk_from_code(shortcode)
+                            media_info = fetch_media_info(cl, media_pk, username, password, use_cache=False)
+                        except Exception as e:
+                            print(f"[watch] {shortcode}: media info failed: {str(e)[:100]}")
+                            metrics.incr("watch_errors")
+                            continue
+                        metrics.incr("watch_polls")
+
+                        last_count = log.last_fetched_count(shortcode)
+                        sampled_at = log.record(shortcode, media_pk, media_info.like_count,
+                                                media_info.comment_count)
+                        status = "unchanged"
+                        if last_count is None or media_info.comment_count != last_count:
+                            changed += 1
+                            expected_new = None if last_count is None else media_info.comment_count - last_count
+                            try:
+                                result = scrape_with_instagrapi(url, username, password,
+                                                                expected_new=expected_new, **options)
+                                if result:
+                                    metadata, comments = result
+                                    if comments:
+                                        with metrics.stage("export"):
+                                            export_post(metadata, comments, args.format,
+                                                        f"instagram_{shortcode}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+                                                        args.outdir)
+                                    confirm_export(shortcode)
+                                    log.mark_fetched(shortcode, sampled_at)
+                                    fetched += 1
+                                    status = f"fetched {len(comments)}"
+                                else:
+                                    # Not marked: the next cycle tries again
+                                    abandon_export(shortcode)
+                                    status = "fetch failed"
+                            except Exception as e:
+                                # Watermark and fetched count stay put: the next cycle gets them again
+                                abandon_export(shortcode)
+                                metrics.incr("watch_errors")
+                                print(f"[watch] {shortcode}: {str(e)[:100]}")
+                                status = "export failed"
+
+                    writer.writerow([datetime.now().strftime('%Y-%m-%d %H:%M:%S'), shortcode,
+                                     media_info.like_count, media_info.comment_count, status])
+                    series.flush()
+                    print(f"[watch] {shortcode}: {media_info.like_count} likes, "
+                          f"{media_info.comment_count} comments (last fetch at {last_count}) - {status}")
+
+                print(f"[watch] cycle {cycle}: {len(targets)} posts polled, {changed} changed, "
+                      f"{fetched} fetched in {time.monotonic() - started:.1f}s")
+                if args.cycles and cycle >= args.cycles:
+                    break
+                time.sleep(max(0.0, args.interval * 60 - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        print("\nStopping watch...")
+    finally:
+        log.close()
+
+    report_paths = metrics.write_run_report(args.outdir, f"watch_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    print(f"Series: {series_path}")
+    print(f"Reporte de ejecucion: {report_paths[0]}")
+    return 0
+
+def parse_args(argv=None):
+    """Command line options"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Instagram comment scraper")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue interrupted comment crawls from their last checkpoint")
+    parser.add_argument("--incremental", choices=["delta", "merged"],
+                        help="only fetch comments newer than the previous incremental run and "
+                             "export just the new ones (delta) or the full merged set (merged)")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="drop comments already exported by previous runs (persistent index)")
+    parser.add_argument("--no-replies", action="store_true",
+                        help="skip fetching the reply threads (\"view replies\") of each comment")
+    parser.add_argument("--enrich-profiles", action="store_true",
+                        help="add followers, verification and account type of each commenter "
+                             "(cached per user for PROFILE_CACHE_TTL_HOURS)")
+    cache = parser.add_mutually_exclusive_group()
+    cache.add_argument("--cache-only", action="store_true",
+                       help="serve everything from the local cache, never hit the network")
+    cache.add_argument("--refresh", action="store_true",
+                       help="ignore cached responses and refetch them")
+    parser.add_argument("--profile", metavar="URL",
+                        help="scrape a single URL under cProfile and dump the stats")
+    parser.add_argument("--fake-service", metavar="URL", default=common.FAKE_SERVICE_URL,
+                        help="send Instagram and Scrapfly requests to benchmarks/fake_service.py")
+    batch = parser.add_argument_group("batch mode (non-interactive)")
+    batch.add_argument("--links", nargs="+", metavar="URL", help="post/reel URLs to scrape")
+    batch.add_argument("--input", metavar="FILE",
+                       help="file with one URL per line ('-' reads stdin)")
+    batch.add_argument("--format", choices=list(EXPORTERS), default="csv", help="output format")
+    batch.add_argument("--outdir", default=os.path.join("scrape", "instagram"), help="output directory")
+    batch.add_argument("--secrets-file", metavar="FILE",
+                       help="KEY=VALUE file with INSTAGRAM_USERNAME/INSTAGRAM_PASSWORD "
+                            "(otherwise they are read from the environment)")
+    batch.add_argument("--chunk-size", type=int, default=50,
+                       help="URLs per round in concurrent/multi-account batches")
+    watch = parser.add_argument_group("watch mode (uses --links/--input)")
+    watch.add_argument("--watch", action="store_true",
+                       help="poll likes/comment counts and fetch comments only when the count changes")
+    watch.add_argument("--interval", type=float, default=30, metavar="MINUTES",
+                       help="minutes between polls of every post")
+    watch.add_argument("--cycles", type=int, default=0,
+                       help="stop after this many polls (0 = until interrupted)")
+    parser.add_argument("--serve", metavar="[HOST:]PORT",
+                        help="run as a local service: warm sessions and an HTTP job queue "
+                             "(POST /jobs, GET /jobs/<id>, /health, /metrics)")
+    return parser.parse_args(argv)
 
 def main():
+    args = parse_args()
+    if args.cache_only:
+        response_cache.set_cache_mode(response_cache.CACHE_ONLY)
+    elif args.refresh:
+        response_cache.set_cache_mode(response_cache.REFRESH)
+    if args.fake_service:
+        use_fake_service(args.fake_service)
+    if args.serve:
+        sys.exit(serve(args))
+    if args.watch:
+        sys.exit(run_watch(args))
+    if args.links or args.input:
+        sys.exit(run_batch(args))
+
     print("="*70)
     print("INSTAGRAM COMMENT SCRAPER v2.2 (FINAL)")
     print("="*70)
@@ -580,6 +2020,10 @@ def main():
     else:
         print("\nProceeding without authentication - will get limited data only")
 
+    if args.profile:
+        profile_single_url(args.profile, instagram_username, instagram_password)
+        return
+
     num_videos = int(input("\nCuantos links quieres scrapear? (max 10): "))
     links = [input(f"Link {i+1}: ") for i in range(num_videos)]
     
@@ -598,13 +2042,28 @@ def main():
     links = cleaned_links
     validate_links(links, "instagram")
 
-    export_format = input("\nFormato de salida (csv/xlsx): ").lower()
+    export_format = input("\nFormato de salida (csv/xlsx/parquet/jsonl/csv.gz/csv.zst): ").lower().strip()
+    if export_format not in EXPORTERS:
+        print(f"Formato '{export_format}' no soportado. Usando CSV.")
+        export_format = "csv"
+
+    scrape_options = {'resume': args.resume, 'incremental': args.incremental,
+                      'fetch_replies': not args.no_replies, 'dedupe': args.dedupe,
+                      'enrich_profiles': args.enrich_profiles}
+    accounts = load_instagram_accounts(instagram_username, instagram_password) if use_auth else []
 
     all_data = []
-    for link in links:
-        data = scrape_instagram_video(link, instagram_username, instagram_password)
-        if data:
-            all_data.append(data)
+    if not use_auth and len(links) > 1:
+        results = scrape_batch_scrapfly_only(links)
+        all_data = [data for data in results if data]
+    elif len(accounts) > 1 and len(links) > 1:
+        results = scrape_batch_multi_account(links, accounts, **scrape_options)
+        all_data = [data for data in results if data]
+    else:
+        for link in links:
+            data = scrape_instagram_video(link, instagram_username, instagram_password, **scrape_options)
+            if data:
+                all_data.append(data)
 
     if not all_data:
         print("\nNo se pudo scrapear nada.")
@@ -614,22 +2073,36 @@ def main():
     date_str = format_date_for_filename()
     outdir = os.path.join("scrape", "instagram")
     os.makedirs(outdir, exist_ok=True)
-    outfile = os.path.join(outdir, f"instagram_{date_str}.{export_format}")
+    outfiles = []
 
-    # Prepare data for export
-    for post in all_data:
+    # Prepare data for export (one file per post, named after its shortcode)
+    for number, post in enumerate(all_data, 1):
         # Extract comments from the post
         comments = post.pop('comments', [])
 
         # Create metadata dict
         metadata = {k: v for k, v in post.items() if k != 'comments'}
 
-        if export_format == "xlsx":
-            export_to_excel(metadata, comments, "instagram", f"instagram_{date_str}")
-        else:
-            export_to_csv(metadata, comments, "instagram", f"instagram_{date_str}")
-
-    print(f"\nDatos exportados en {outfile}")
+        canonical = canonicalize_instagram_url(metadata.get('Post URL') or '')
+        shortcode = canonical[0] if canonical else None
+        filename = f"instagram_{shortcode}_{date_str}" if shortcode else f"instagram_{number}_{date_str}"
+        try:
+            with metrics.post_context(metadata.get('Post URL')), metrics.stage("export"):
+                outfiles.append(export_post(metadata, comments, export_format, filename))
+        except Exception as e:
+            print(f"Error exporting {metadata.get('Post URL')}: {e}")
+            if shortcode:
+                abandon_export(shortcode)
+            continue
+        if shortcode:
+            confirm_export(shortcode)
+
+    print(f"\nDatos exportados en {outdir}:")
+    for outfile in outfiles:
+        print(f"   {outfile}")
+
+    report_paths = metrics.write_run_report(outdir, f"run_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    print(f"Reporte de ejecucion: {report_paths[0]} / {report_paths[1]}")
 
 if __name__ == "__main__":
     main()
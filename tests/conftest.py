@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los modulos se importan como en src/ (helpers.*)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
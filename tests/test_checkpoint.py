@@ -0,0 +1,73 @@
+import pytest
+
+from helpers.checkpoint import CheckpointStore, CheckpointComments
+from helpers.comment_record import CommentRecord
+
+
+def record(number, pk, is_reply=False, parent=None):
+    return CommentRecord(number, f"user{pk}", f"comment {pk}", 0, 1700000000 + pk, is_reply, pk, parent)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "checkpoints.sqlite")
+
+
+def test_save_page_keeps_cursor_and_next_number(db_path):
+    store = CheckpointStore(db_path)
+    store.save_page("ABC", 99, [record(1, 11), record(2, 12)], {"min_id": "c1"})
+    assert store.get("ABC") == {"media_pk": "99", "cursor": {"min_id": "c1"}, "next_number": 3, "done": False}
+    store.close()
+
+
+def test_resume_reads_back_every_saved_page(db_path):
+    store = CheckpointStore(db_path)
+    store.save_page("ABC", 99, [record(1, 11), record(2, 12)], {"min_id": "c1"})
+    store.save_page("ABC", 99, [record(3, 13)], {"min_id": "c2"})
+    store.close()
+
+    # A new run opens the same database and continues from the saved cursor
+    resumed = CheckpointStore(db_path)
+    checkpoint = resumed.get("ABC")
+    assert checkpoint["cursor"] == {"min_id": "c2"} and checkpoint["next_number"] == 4
+    rows = list(resumed.iter_rows("ABC"))
+    assert [r.pk for r in rows] == [11, 12, 13]
+    assert [r["Comment Number"] for r in rows] == [1, 2, 3]
+
+    resumed.save_page("ABC", 99, [record(4, 14)], None)
+    assert resumed.get("ABC")["done"] is True
+    assert [r.pk for r in resumed.iter_rows("ABC")] == [11, 12, 13, 14]
+    resumed.close()
+
+
+def test_empty_page_keeps_next_number(db_path):
+    store = CheckpointStore(db_path)
+    store.save_page("ABC", 99, [record(1, 11)], {"min_id": "c1"})
+    store.save_page("ABC", 99, [], {"min_id": "c2"})
+    assert store.get("ABC")["next_number"] == 2
+    assert store.get("ABC")["cursor"] == {"min_id": "c2"}
+    store.close()
+
+
+def test_reset_forgets_the_post(db_path):
+    store = CheckpointStore(db_path)
+    store.save_page("ABC", 99, [record(1, 11)], None)
+    store.reset("ABC")
+    assert store.get("ABC") is None
+    assert list(store.iter_rows("ABC")) == []
+    store.close()
+
+
+def test_checkpoint_comments_skip_renumber_and_append_replies(db_path):
+    store = CheckpointStore(db_path)
+    store.save_page("ABC", 99, [record(1, 11), record(2, 12), record(3, 13)], None)
+    store.close()
+
+    reply = record(3, 50, is_reply=True, parent=2)
+    comments = CheckpointComments("ABC", 2, skip_numbers=[1], extra_rows=[reply], path=db_path)
+    assert len(comments) == 3
+    rows = list(comments)
+    assert [r.pk for r in rows] == [12, 13, 50]
+    assert [r["Comment Number"] for r in rows] == [1, 2, 3]
+    # The view can be read again (each pass opens its own connection)
+    assert [r.pk for r in comments] == [12, 13, 50]
@@ -0,0 +1,86 @@
+import pytest
+
+import scraper_instagram as scraper
+from helpers.dedupe_index import SeenCommentIndex
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "seen.sqlite")
+
+
+@pytest.fixture(autouse=True)
+def no_pending_exports():
+    scraper._PENDING_EXPORTS.clear()
+    yield
+    scraper._PENDING_EXPORTS.clear()
+
+
+def test_add_reports_duplicates_within_a_run(db_path):
+    index = SeenCommentIndex(db_path)
+    assert index.add(1, 100) is True
+    assert index.add(1, 100) is False
+    assert index.add(2, 100) is True
+    index.close()
+
+
+def test_commit_persists_the_pending_pks(db_path):
+    index = SeenCommentIndex(db_path)
+    index.add(1, 100)
+    index.add(1, 101)
+    assert index.commit(1) == 2
+    index.close()
+
+    later = SeenCommentIndex(db_path)
+    assert later.known(1) == 2
+    assert later.add(1, 100) is False
+    assert later.add(1, 102) is True
+    later.close()
+
+
+def test_discard_forgets_the_pending_pks(db_path):
+    index = SeenCommentIndex(db_path)
+    index.add(1, 100)
+    index.commit(1)
+    index.add(1, 101)
+    index.discard(1)
+    # Only the committed pk is still known, in this run and the next
+    assert index.add(1, 101) is True
+    assert index.add(1, 100) is False
+    index.close()
+
+    later = SeenCommentIndex(db_path)
+    assert later.known(1) == 1
+    later.close()
+
+
+def test_confirm_export_commits_the_deferred_index(db_path):
+    index = SeenCommentIndex(db_path)
+    index.add(1, 100)
+    scraper.defer_until_exported("ABC", lambda: index.commit(1), lambda: index.discard(1))
+    scraper.confirm_export("ABC")
+    assert "ABC" not in scraper._PENDING_EXPORTS
+    index.close()
+
+    assert SeenCommentIndex(db_path).known(1) == 1
+
+
+def test_abandon_export_discards_the_deferred_index(db_path):
+    index = SeenCommentIndex(db_path)
+    index.add(1, 100)
+    scraper.defer_until_exported("ABC", lambda: index.commit(1), lambda: index.discard(1))
+    scraper.abandon_export("ABC")
+    assert "ABC" not in scraper._PENDING_EXPORTS
+    # The comment comes back as new on the next run
+    assert index.add(1, 100) is True
+    index.close()
+
+    assert SeenCommentIndex(db_path).known(1) == 0
+
+
+def test_confirm_after_abandon_runs_nothing(db_path):
+    commits = []
+    scraper.defer_until_exported("ABC", lambda: commits.append("commit"))
+    scraper.abandon_export("ABC")
+    scraper.confirm_export("ABC")
+    assert commits == []
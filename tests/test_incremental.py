@@ -0,0 +1,116 @@
+import pytest
+
+import scraper_instagram as scraper
+from helpers.checkpoint import CheckpointStore
+
+MEDIA_PK = 4242
+
+
+class FakeClient:
+    """Comments endpoint of one post, paginated with a min_id offset cursor"""
+
+    username = "incremental-tester"
+
+    def __init__(self, pks, page_size=3, honours_sort_order=True):
+        self.pks = list(pks)
+        self.page_size = page_size
+        self.honours_sort_order = honours_sort_order
+        self.requests = 0
+
+    def private_request(self, path, params=None):
+        self.requests += 1
+        params = params or {}
+        newest_first = self.honours_sort_order and params.get("sort_order") == "newest"
+        pks = sorted(self.pks, reverse=newest_first)
+        offset = int(params.get("min_id") or 0)
+        end = offset + self.page_size
+        body = {"comments": [raw_comment(pk) for pk in pks[offset:end]], "status": "ok"}
+        if end < len(pks):
+            body.update(has_more_headload_comments=True, next_min_id=str(end))
+        return body
+
+
+def raw_comment(pk):
+    return {"pk": pk, "text": f"comment {pk}", "comment_like_count": 0, "created_at_utc": 1700000000 + pk,
+            "user": {"username": f"user{pk}", "pk": pk}, "child_comment_count": 0}
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # The deferred save opens the default checkpoint database under ./scrape
+    monkeypatch.chdir(tmp_path)
+    scraper._PENDING_EXPORTS.clear()
+    yield
+    scraper._PENDING_EXPORTS.clear()
+
+
+def fetch(cl, mode="delta"):
+    store = CheckpointStore()
+    try:
+        return scraper.fetch_new_comments(cl, MEDIA_PK, store, mode, shortcode="ABC")
+    finally:
+        store.close()
+
+
+def watermark():
+    store = CheckpointStore()
+    try:
+        return store.get_watermark(MEDIA_PK)
+    finally:
+        store.close()
+
+
+def test_watermark_is_saved_only_after_the_export_is_confirmed():
+    rows = fetch(FakeClient(range(1, 8)))
+    assert [r.pk for r in rows] == list(range(1, 8))
+    assert watermark() is None
+
+    scraper.confirm_export("ABC")
+    assert watermark()[0] == 7
+
+
+def test_abandoned_export_gets_the_same_comments_again():
+    fetch(FakeClient(range(1, 8)))
+    scraper.confirm_export("ABC")
+
+    cl = FakeClient(range(1, 11))
+    assert [r.pk for r in fetch(cl)] == [8, 9, 10]
+    scraper.abandon_export("ABC")
+    assert watermark()[0] == 7
+
+    assert [r.pk for r in fetch(cl)] == [8, 9, 10]
+    scraper.confirm_export("ABC")
+    assert watermark()[0] == 10
+
+
+def test_newest_first_stops_at_the_first_seen_comment():
+    fetch(FakeClient(range(1, 31)))
+    scraper.confirm_export("ABC")
+
+    cl = FakeClient(range(1, 33))
+    rows = fetch(cl)
+    # Page 1 is 32, 31, 30: it reaches the watermark, so no more pages
+    assert cl.requests == 1
+    assert [r.pk for r in rows] == [31, 32]
+    assert [r["Comment Number"] for r in rows] == [1, 2]
+
+
+def test_oldest_first_scans_every_page():
+    fetch(FakeClient(range(1, 31)))
+    scraper.confirm_export("ABC")
+
+    cl = FakeClient(range(1, 33), honours_sort_order=False)
+    rows = fetch(cl)
+    assert cl.requests == 11
+    assert [r.pk for r in rows] == [31, 32]
+    scraper.confirm_export("ABC")
+    assert watermark()[0] == 32
+
+
+def test_merged_mode_returns_every_exported_comment():
+    fetch(FakeClient(range(1, 5)))
+    scraper.confirm_export("ABC")
+
+    rows = fetch(FakeClient(range(1, 7)), mode="merged")
+    assert [r.pk for r in rows] == [1, 2, 3, 4, 5, 6]
+    assert [r["Comment Number"] for r in rows] == [1, 2, 3, 4, 5, 6]
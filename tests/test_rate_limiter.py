@@ -0,0 +1,191 @@
+import threading
+
+import pytest
+
+from helpers import rate_limiter, retry_policy
+from helpers.rate_limiter import AdaptiveRateLimiter
+from helpers.retry_policy import CHALLENGE, THROTTLED, TRANSIENT, CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock)
+    monkeypatch.setattr(retry_policy.time, "monotonic", clock)
+    return clock
+
+
+def make_limiter(rate=1.0):
+    return AdaptiveRateLimiter("test", rate=rate, min_rate=0.1, max_rate=2.0, burst=3)
+
+
+def test_throttle_halves_the_rate():
+    limiter = make_limiter(rate=1.0)
+    limiter.record_failure(THROTTLED)
+    assert limiter.rate == pytest.approx(0.5)
+    limiter.record_failure(THROTTLED)
+    assert limiter.rate == pytest.approx(0.25)
+
+
+def test_throttle_never_goes_below_the_minimum():
+    limiter = make_limiter(rate=0.15)
+    limiter.record_failure(THROTTLED)
+    assert limiter.rate == pytest.approx(0.1)
+
+
+def test_throttle_drops_the_burst():
+    limiter = make_limiter()
+    limiter.tokens = 3.0
+    limiter.record_failure(THROTTLED)
+    assert limiter.tokens <= 0
+
+
+def test_challenge_goes_straight_to_the_floor():
+    limiter = make_limiter(rate=2.0)
+    limiter.record_failure(CHALLENGE)
+    assert limiter.rate == pytest.approx(0.1)
+
+
+def test_other_errors_keep_the_rate():
+    limiter = make_limiter(rate=1.0)
+    limiter.record_failure(TRANSIENT)
+    assert limiter.rate == pytest.approx(1.0)
+
+
+def test_additive_increase_after_a_run_of_successes():
+    limiter = make_limiter(rate=1.0)
+    for _ in range(rate_limiter.INCREASE_AFTER - 1):
+        limiter.record_success()
+    assert limiter.rate == pytest.approx(1.0)
+    limiter.record_success()
+    assert limiter.rate == pytest.approx(1.0 + rate_limiter.INCREASE_STEP)
+
+
+def test_throttle_resets_the_success_run():
+    limiter = make_limiter(rate=1.0)
+    for _ in range(rate_limiter.INCREASE_AFTER - 1):
+        limiter.record_success()
+    limiter.record_failure(THROTTLED)
+    limiter.record_success()
+    assert limiter.rate == pytest.approx(0.5)
+
+
+def test_increase_stops_at_the_maximum():
+    limiter = make_limiter(rate=2.0)
+    for _ in range(rate_limiter.INCREASE_AFTER * 3):
+        limiter.record_success()
+    assert limiter.rate == pytest.approx(2.0)
+
+
+def test_effective_rate_counts_intervals(clock):
+    limiter = make_limiter()
+    for offset in (0.0, 1.0, 2.0, 3.0, 4.0):
+        limiter.recent.append(clock.now + offset)
+    clock.now += 4.0
+    # 5 requests, 4 seconds apart end to end: 1 req/s
+    assert limiter.effective_rate() == pytest.approx(1.0)
+
+
+def test_effective_rate_needs_two_requests(clock):
+    limiter = make_limiter()
+    limiter.recent.append(clock.now)
+    assert limiter.effective_rate() == 0.0
+
+
+def open_breaker(clock, cooldown=10):
+    breaker = CircuitBreaker("test", threshold=2, cooldown=cooldown)
+    breaker.record_failure(TRANSIENT)
+    breaker.record_failure(TRANSIENT)
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    clock.now += cooldown + 1
+    return breaker
+
+
+def test_breaker_half_open_lets_a_single_probe_through(clock):
+    breaker = open_breaker(clock)
+    breaker.check()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_breaker_half_open_single_probe_across_threads(clock):
+    breaker = open_breaker(clock)
+    admitted = []
+    start = threading.Barrier(8)
+
+    def caller():
+        start.wait()
+        try:
+            breaker.check()
+            admitted.append(True)
+        except CircuitOpenError:
+            pass
+
+    threads = [threading.Thread(target=caller) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(admitted) == 1
+
+
+def test_breaker_closes_after_a_successful_probe(clock):
+    breaker = open_breaker(clock)
+    breaker.check()
+    breaker.record_success()
+    breaker.check()
+    breaker.check()
+
+
+def test_breaker_reopens_after_a_failed_probe(clock):
+    breaker = open_breaker(clock)
+    breaker.check()
+    breaker.record_failure(TRANSIENT)
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    clock.now += 11
+    breaker.check()
+
+
+def test_breaker_released_probe_admits_the_next_caller(clock):
+    breaker = open_breaker(clock)
+    breaker.check()
+    breaker.release()
+    breaker.check()
+
+
+def test_validation_error_on_the_probe_frees_the_half_open_slot(clock):
+    breaker = retry_policy.get_breaker("test-validation")
+    breaker.threshold, breaker.cooldown = 2, 10
+    breaker.record_failure(TRANSIENT)
+    breaker.record_failure(TRANSIENT)
+    clock.now += 11
+
+    def invalid():
+        raise ValueError("No media data in API response")
+
+    with pytest.raises(ValueError):
+        retry_policy.call_with_policy(invalid, account="test-validation")
+    assert retry_policy.call_with_policy(lambda: "ok", account="test-validation") == "ok"
+
+
+def test_fatal_errors_do_not_open_the_breaker():
+    breaker = retry_policy.get_breaker("test-fatal")
+
+    def missing_user():
+        raise KeyError("User not found")
+
+    for _ in range(breaker.threshold + 2):
+        with pytest.raises(KeyError):
+            retry_policy.call_with_policy(missing_user, account="test-fatal")
+    assert breaker.opened_at is None
+    assert retry_policy.call_with_policy(lambda: "ok", account="test-fatal") == "ok"